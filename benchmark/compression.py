@@ -0,0 +1,89 @@
+from collections import defaultdict
+from urllib.parse import parse_qsl
+from utils import compression
+from utils.snapshot import Snapshot
+import json
+import re
+import sys
+import time
+
+
+def endpoint(key):
+    """
+    Groups snapshot keys by route and factor, e.g. /localCouncil/template-data/{id}/{id}?factor=age
+    """
+    path, _, query = key.partition("?")
+    path = re.sub(r"/\d+", "/{id}", path)
+    factor = dict(parse_qsl(query)).get("factor")
+    return f"{path}?factor={factor}" if factor else path
+
+
+def measure(snapshot):
+    """
+    Returns per-endpoint byte counts and the CPU spent compressing every response
+    on each request versus once per dataset version
+    """
+    groups = defaultdict(list)
+    for key in snapshot.keys():
+        groups[endpoint(key)].append(bytes(snapshot.get(key)))
+
+    encodings = ["gzip"] + (["br"] if compression.brotli is not None else [])
+    results = {}
+    for name, bodies in sorted(groups.items()):
+        result = {
+            "responses": len(bodies),
+            "identityBytes": sum(map(len, bodies)) / len(bodies),
+        }
+        for encoding in encodings:
+            started = time.process_time()
+            per_request = [compression.compress(body, encoding) for body in bodies]
+            per_request_cpu = time.process_time() - started
+            started = time.process_time()
+            cached = [
+                compression.compress(body, encoding, cached=True) for body in bodies
+            ]
+            cached_cpu = time.process_time() - started
+            result[encoding] = {
+                "bytes": sum(map(len, cached)) / len(bodies),
+                "perRequestBytes": sum(map(len, per_request)) / len(bodies),
+                # CPU a request costs when compressing on the fly; a precompressed
+                # response costs `cachedCpuMs` once per dataset version
+                "perRequestCpuMs": per_request_cpu * 1000 / len(bodies),
+                "cachedCpuMs": cached_cpu * 1000 / len(bodies),
+            }
+        results[name] = result
+    return results
+
+
+def main(path, output=None):
+    snapshot = Snapshot(path)
+    try:
+        results = measure(snapshot)
+    finally:
+        snapshot.close()
+
+    print(
+        f"{'endpoint':56} {'n':>5} {'identity':>9} {'gzip':>8} {'br':>8} "
+        f"{'saved':>6} {'cpu/req':>8}"
+    )
+    for name, result in results.items():
+        best = result.get("br", result["gzip"])
+        print(
+            f"{name:56} {result['responses']:5} {result['identityBytes']:9.0f} "
+            f"{result['gzip']['bytes']:8.0f} {result.get('br', {}).get('bytes', 0):8.0f} "
+            f"{1 - best['bytes'] / result['identityBytes']:6.1%} "
+            f"{best['perRequestCpuMs']:7.3f}ms"
+        )
+    if output is not None:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3):
+        print(
+            "usage: python -m benchmark.compression <snapshot path> [json output]",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+    main(*sys.argv[1:])
@@ -0,0 +1,31 @@
+from pymongo import monitoring
+import os
+import pytest
+
+# MongoDB server the query tests seed and run against; its `district` and `stats`
+# databases are replaced, so never point it at a server holding real data
+MONGO_TEST_URI = os.getenv("MONGO_TEST_URI")
+
+if MONGO_TEST_URI:
+    # read by the app modules at import time, so set before any of them is imported
+    os.environ["MONGO_CONNECTION_URI"] = MONGO_TEST_URI
+    os.environ["SNAPSHOT_PATH"] = ""
+    os.environ["CACHE_WARMUP"] = "false"
+    # keep the background refreshes from issuing commands while one is recorded
+    os.environ["DATASET_CHECK_INTERVAL"] = "3600"
+    os.environ["DISTRICT_REFRESH_INTERVAL"] = "3600"
+
+
+@pytest.fixture(scope="session")
+def command_recorder():
+    """
+    A CommandRecorder registered for every client created after it, the app's
+    included. Skips the test when MONGO_TEST_URI is not set.
+    """
+    if not MONGO_TEST_URI:
+        pytest.skip("MONGO_TEST_URI is not set")
+    from utils.explain import CommandRecorder
+
+    recorder = CommandRecorder()
+    monitoring.register(recorder)
+    return recorder
@@ -0,0 +1,113 @@
+from utils import diversity
+import json
+import random
+import sys
+import time
+
+AGE_STAIR = 10
+
+# (regions, members per region) of each council level
+SCALES = {
+    "national": (1, (250, 300)),
+    "metro": (17, (20, 120)),
+    "local": (226, (7, 40)),
+}
+
+
+def histograms(regions, members, rng):
+    """
+    Returns random age histograms ([minAge], [count]) in 5-year bins for `regions` regions
+    """
+    bins = list(range(25, 85, 5))
+    result = []
+    for _ in range(regions):
+        counts = [0] * len(bins)
+        for _ in range(rng.randint(*members)):
+            counts[min(int(rng.gauss(55, 10) - 25) // 5, len(bins) - 1)] += 1
+        result.append((bins, counts))
+    return result
+
+
+def timed(fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - started) / repeat * 1000
+
+
+def measure(scale, repeat=20):
+    regions, members = SCALES[scale]
+    hists = histograms(regions, members, random.Random(0))
+
+    def per_member():
+        # the original path: one list item per member, re-binned by count()
+        results = []
+        for bins, counts in hists:
+            members = [age for age, n in zip(bins, counts) for _ in range(n)]
+            results.append(
+                (
+                    diversity.gini_simpson(members, stair=AGE_STAIR),
+                    diversity.shannon(members, stair=AGE_STAIR),
+                )
+            )
+        return results
+
+    def per_histogram():
+        results = []
+        for bins, counts in hists:
+            counter = diversity.count_histogram(bins, counts, stair=AGE_STAIR)
+            values = list(counter.values())
+            results.append(
+                (
+                    diversity.gini_simpson_counts(values),
+                    diversity.shannon_counts(values),
+                )
+            )
+        return results
+
+    def batched():
+        matrix, _ = diversity.count_matrix(
+            [
+                diversity.count_histogram(bins, counts, stair=AGE_STAIR)
+                for bins, counts in hists
+            ]
+        )
+        return list(
+            zip(
+                diversity.gini_simpson_counts(matrix),
+                diversity.shannon_counts(matrix),
+            )
+        )
+
+    expected, per_member_ms = timed(per_member, repeat)
+    result = {"regions": regions, "perMemberMs": per_member_ms}
+    for name, fn in [("perHistogram", per_histogram), ("batched", batched)]:
+        computed, ms = timed(fn, repeat)
+        result[f"{name}Ms"] = ms
+        result[f"{name}MaxError"] = max(
+            abs(a - b)
+            for pair, other in zip(expected, computed)
+            for a, b in zip(pair, other)
+        )
+    return result
+
+
+def main(output=None):
+    results = {scale: measure(scale) for scale in SCALES}
+    print(
+        f"{'scale':10} {'regions':>7} {'per member':>11} {'histogram':>10} "
+        f"{'batched':>9} {'max error':>10}"
+    )
+    for scale, result in results.items():
+        print(
+            f"{scale:10} {result['regions']:7} {result['perMemberMs']:9.3f}ms "
+            f"{result['perHistogramMs']:8.3f}ms {result['batchedMs']:7.3f}ms "
+            f"{max(result['perHistogramMaxError'], result['batchedMaxError']):10.2e}"
+        )
+    if output is not None:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2])
@@ -0,0 +1,158 @@
+from benchmark import seed
+import asyncio
+import httpx
+import json
+import os
+import re
+import sys
+import time
+
+# a mongod to seed and query; its district and stats collections are replaced.
+# Without it, an in-memory mongomock-motor client is used.
+BENCHMARK_MONGO_URI = os.getenv("BENCHMARK_MONGO_URI")
+# requests in flight at once
+BENCHMARK_CONCURRENCY = int(os.getenv("BENCHMARK_CONCURRENCY", "32"))
+# passes over every endpoint once the caches are warm
+BENCHMARK_ROUNDS = int(os.getenv("BENCHMARK_ROUNDS", "1"))
+
+ROUND_TRIPS = re.compile(r'db;[^,]*desc="(\d+) round-trips"')
+
+
+def percentile(values, p):
+    """
+    Nearest-rank percentile of sorted `values`
+    """
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(0, round(p / 100 * len(values)) - 1))]
+
+
+def summarize(samples, elapsed=None):
+    """
+    Returns the request count, errors, latency percentiles (ms) and Mongo
+    round-trips per request of [(status, seconds, round-trips)]
+    """
+    latencies = sorted(seconds * 1000 for _, seconds, _ in samples)
+    round_trips = [count for _, _, count in samples]
+    summary = {
+        "requests": len(samples),
+        "errors": sum(status != 200 for status, _, _ in samples),
+        "p50Ms": percentile(latencies, 50),
+        "p95Ms": percentile(latencies, 95),
+        "p99Ms": percentile(latencies, 99),
+        "roundTripsMean": sum(round_trips) / len(round_trips),
+        "roundTripsMax": max(round_trips),
+    }
+    if elapsed is not None:
+        summary["seconds"] = elapsed
+        summary["requestsPerSecond"] = len(samples) / elapsed
+    return summary
+
+
+async def run(http, requests, concurrency):
+    """
+    Issues every (route template, path, query) of `requests` with at most
+    `concurrency` in flight and returns {route template: [samples]} and the wall time
+    """
+    queue = asyncio.Queue()
+    for request in requests:
+        queue.put_nowait(request)
+    samples = {}
+
+    async def worker():
+        while not queue.empty():
+            route, path, query = queue.get_nowait()
+            started = time.perf_counter()
+            # each request runs in its own task, with its own context, as under uvicorn
+            response = await asyncio.create_task(http.get(path, params=query))
+            seconds = time.perf_counter() - started
+            match = ROUND_TRIPS.search(response.headers.get("server-timing", ""))
+            samples.setdefault(route, []).append(
+                (response.status_code, seconds, int(match[1]) if match else 0)
+            )
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return samples, time.perf_counter() - started
+
+
+async def measure():
+    from main import app
+    from model import MongoDB
+    from utils import metrics
+    from utils.snapshot import snapshot_requests
+
+    async with app.router.lifespan_context(app):
+        documents = await seed.seed_app()
+
+        requests = [
+            (
+                metrics.route_template(
+                    app.routes, {"type": "http", "method": "GET", "path": path}
+                ),
+                path,
+                query,
+            )
+            async for path, query in snapshot_requests(MongoDB.client)
+        ]
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        results = {
+            "backend": "mongod" if BENCHMARK_MONGO_URI else "mongomock",
+            "documents": documents,
+            "endpoints": len(requests),
+            "concurrency": BENCHMARK_CONCURRENCY,
+        }
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://benchmark"
+        ) as http:
+            # every endpoint once against an empty cache, then BENCHMARK_ROUNDS warm passes
+            for phase, rounds in [("cold", 1), ("warm", BENCHMARK_ROUNDS)]:
+                samples, elapsed = await run(
+                    http, requests * rounds, BENCHMARK_CONCURRENCY
+                )
+                results[phase] = {
+                    **summarize(
+                        [sample for route in samples.values() for sample in route],
+                        elapsed,
+                    ),
+                    "routes": {
+                        route: summarize(route_samples)
+                        for route, route_samples in sorted(samples.items())
+                    },
+                }
+    return results
+
+
+def main(output=None):
+    if BENCHMARK_MONGO_URI:
+        os.environ["MONGO_CONNECTION_URI"] = BENCHMARK_MONGO_URI
+    else:
+        seed.use_mongomock()
+    # the benchmark measures the database path, even with SNAPSHOT_PATH in .env
+    os.environ["SNAPSHOT_PATH"] = ""
+    results = asyncio.run(measure())
+
+    print(
+        f"{results['backend']}: {results['endpoints']} endpoints, "
+        f"{results['documents']} documents, concurrency {results['concurrency']}"
+    )
+    for phase in ("cold", "warm"):
+        result = results[phase]
+        print(
+            f"\n{phase}: {result['requests']} requests, {result['errors']} errors, "
+            f"{result['requestsPerSecond']:.0f} req/s"
+        )
+        print(f"{'route':48} {'n':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'db/req':>7}")
+        for route, summary in [("all", result), *result["routes"].items()]:
+            print(
+                f"{route:48} {summary['requests']:6} {summary['p50Ms']:6.1f}ms "
+                f"{summary['p95Ms']:6.1f}ms {summary['p99Ms']:6.1f}ms "
+                f"{summary['roundTripsMean']:7.2f}"
+            )
+    if output is not None:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2])
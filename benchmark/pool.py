@@ -0,0 +1,135 @@
+from benchmark import load, seed
+from model.MongoDB import MongoDB, MongoSettings
+from motor.motor_asyncio import AsyncIOMotorClient
+import asyncio
+import json
+import random
+import sys
+import time
+
+# client settings compared, as overrides of the MONGO_* environment variables
+CONFIGS = {
+    "default": {},
+    "pool 10": {"max_pool_size": 10},
+    "warm pool 64": {"min_pool_size": 64},
+    "zlib": {"compressors": ["zlib"]},
+    "zstd": {"compressors": ["zstd"]},
+    "secondaryPreferred": {"read_preference": "secondaryPreferred"},
+}
+# requests in flight at once
+CONCURRENCY = [1, 16, 64, 256]
+# queries per concurrent worker
+QUERIES = 20
+
+
+def random_query(db, regions, rng):
+    """
+    Returns a random query of the local template routes, issued without the cache
+    """
+    metroId, localId = rng.choice(regions)
+    query = {
+        "councilorType": "local_councilor",
+        "level": 2,
+        "is_elected": True,
+        "metroId": metroId,
+        "localId": localId,
+    }
+    return rng.choice(
+        [
+            lambda: db.stats_db["gender_hist"].find_one(query),
+            lambda: db.stats_db["party_hist"].find_one(query),
+            lambda: db.stats_db["age_hist"]
+            .find({**query, "method": "equal"})
+            .to_list(None),
+            lambda: db.stats_db["diversity_index"].find_one({"localId": localId}),
+        ]
+    )()
+
+
+async def run(db, regions, concurrency):
+    rng = random.Random(concurrency)
+    latencies = []
+
+    async def worker():
+        for _ in range(QUERIES):
+            started = time.perf_counter()
+            await random_query(db, regions, rng)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+    latencies = sorted(seconds * 1000 for seconds in latencies)
+    return {
+        "queries": len(latencies),
+        "queriesPerSecond": len(latencies) / elapsed,
+        "p50Ms": load.percentile(latencies, 50),
+        "p95Ms": load.percentile(latencies, 95),
+        "p99Ms": load.percentile(latencies, 99),
+    }
+
+
+async def measure():
+    base = MongoSettings.from_env().model_copy(update={"uri": load.BENCHMARK_MONGO_URI})
+    raw = AsyncIOMotorClient(base.uri)
+    await seed.seed(raw)
+    regions = [
+        (doc["metroId"], doc["localId"])
+        async for doc in raw["district"]["local_district"].find()
+    ]
+    raw.close()
+
+    results = {}
+    for name, overrides in CONFIGS.items():
+        db = MongoDB()
+        db.connect(MongoSettings.model_validate({**base.model_dump(), **overrides}))
+        try:
+            started = time.perf_counter()
+            if db.settings.min_pool_size:
+                await db.warm_up()
+            warm_up = time.perf_counter() - started
+            # the first request pays for server selection and the first connection
+            started = time.perf_counter()
+            await random_query(db, regions, random.Random(0))
+            first = time.perf_counter() - started
+            results[name] = {
+                "warmUpMs": warm_up * 1000,
+                "firstQueryMs": first * 1000,
+                "concurrency": {
+                    concurrency: await run(db, regions, concurrency)
+                    for concurrency in CONCURRENCY
+                },
+            }
+        finally:
+            db.close()
+    return results
+
+
+def main(output=None):
+    if not load.BENCHMARK_MONGO_URI:
+        print(
+            "BENCHMARK_MONGO_URI must name a disposable mongod; "
+            "connection pools cannot be measured with mongomock",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+    results = asyncio.run(measure())
+
+    print(
+        f"{'settings':20} {'first':>8} {'conc':>5} {'q/s':>8} "
+        f"{'p50':>8} {'p95':>8} {'p99':>8}"
+    )
+    for name, result in results.items():
+        for concurrency, summary in result["concurrency"].items():
+            print(
+                f"{name:20} {result['firstQueryMs']:6.1f}ms {concurrency:5} "
+                f"{summary['queriesPerSecond']:8.0f} {summary['p50Ms']:6.1f}ms "
+                f"{summary['p95Ms']:6.1f}ms {summary['p99Ms']:6.1f}ms"
+            )
+    if output is not None:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2])
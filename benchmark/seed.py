@@ -0,0 +1,218 @@
+from utils import diversity
+import random
+
+# election years of each council level
+LOCAL_YEARS = [2010, 2014, 2018, 2022]
+NATIONAL_YEARS = [2012, 2016, 2020]
+PARTIES = [
+    "더불어민주당",
+    "국민의힘",
+    "정의당",
+    "진보당",
+    "기본소득당",
+    "새누리당",
+    "바른미래당",
+    "무소속",
+]
+# number of local districts of each of the 17 metro districts
+LOCALS_PER_METRO = [25, 16, 8, 10, 5, 5, 5, 0, 31, 18, 11, 15, 14, 22, 23, 18, 0]
+# councilors per region of each level, elected; candidates are about three times as many
+COUNCILORS = {0: (250, 300), 1: (20, 120), 2: (7, 40)}
+
+AGE_BINS = list(range(25, 85, 5))
+
+# database of each seeded collection
+DATABASES = {
+    "metro_district": "district",
+    "local_district": "district",
+    "party": "district",
+    "gender_hist": "stats",
+    "party_hist": "stats",
+    "age_hist": "stats",
+    "age_stat": "stats",
+    "diversity_index": "stats",
+}
+
+
+def regions():
+    """
+    Yields (level, councilorType, metroId, localId) of every region
+    """
+    yield 0, "national_councilor", None, None
+    localId = 0
+    for metroId, locals in enumerate(LOCALS_PER_METRO, start=1):
+        yield 1, "metro_councilor", metroId, None
+        for _ in range(locals):
+            localId += 1
+            yield 2, "local_councilor", metroId, localId
+
+
+def ages(n, rng):
+    """
+    Returns an age histogram of `n` councilors in 5-year bins
+    """
+    counts = [0] * len(AGE_BINS)
+    for _ in range(n):
+        counts[min(max(int(rng.gauss(55, 10)) - 25, 0) // 5, len(AGE_BINS) - 1)] += 1
+    return counts
+
+
+def build(seed=0):
+    """
+    Returns {collection: [documents]} of a synthetic dataset with every metro and
+    local district, every election year and every collection read by the routers
+    """
+    rng = random.Random(seed)
+    docs = {collection: [] for collection in DATABASES}
+    for party in PARTIES:
+        docs["party"].append({"name": party, "color": f"#{rng.randrange(1 << 24):06x}"})
+
+    for level, councilorType, metroId, localId in regions():
+        ids = {}
+        if metroId is not None:
+            ids["metroId"] = metroId
+        if localId is not None:
+            ids["localId"] = localId
+        if level == 1:
+            docs["metro_district"].append({**ids, "sdName": f"광역{metroId}"})
+        elif level == 2:
+            docs["local_district"].append({**ids, "wiwName": f"기초{localId}"})
+
+        for year in NATIONAL_YEARS if level == 0 else LOCAL_YEARS:
+            for is_elected in (True, False):
+                n = rng.randint(*COUNCILORS[level]) * (1 if is_elected else 3)
+                base = {
+                    "councilorType": councilorType,
+                    "level": level,
+                    "is_elected": is_elected,
+                    "year": year,
+                    **ids,
+                }
+                female = int(n * rng.uniform(0.1, 0.4))
+                docs["gender_hist"].append({**base, "남": n - female, "여": female})
+                weights = [rng.random() ** 2 for _ in PARTIES]
+                parties = {party: 0 for party in PARTIES}
+                for party in rng.choices(PARTIES, weights, k=n):
+                    parties[party] += 1
+                docs["party_hist"].append(
+                    {**base, **{party: c for party, c in parties.items() if c}}
+                )
+                counts = ages(n, rng)
+                index = float(
+                    diversity.gini_simpson_counts(
+                        list(diversity.count_histogram(AGE_BINS, counts, 10).values())
+                    )
+                )
+                for method in ("equal", "kmeans"):
+                    docs["age_hist"].append(
+                        {
+                            **base,
+                            "method": method,
+                            "diversityIndex": index,
+                            "data": [
+                                {
+                                    "minAge": low,
+                                    "maxAge": low + 5,
+                                    "count": count,
+                                    "ageGroup": group,
+                                }
+                                for group, (low, count) in enumerate(
+                                    zip(AGE_BINS, counts)
+                                )
+                            ],
+                        }
+                    )
+                members = sorted(
+                    low for low, count in zip(AGE_BINS, counts) for _ in range(count)
+                )
+                docs["age_stat"].append(
+                    {
+                        **base,
+                        "data": [
+                            {
+                                "population": n,
+                                "firstquintile": members[n // 5],
+                                "lastquintile": members[n * 4 // 5],
+                            }
+                        ],
+                    }
+                )
+
+    # age diversity ranks among the regions of the same election and histogram
+    elections = {}
+    for doc in docs["age_hist"]:
+        key = (doc["councilorType"], doc["year"], doc["is_elected"], doc["method"])
+        elections.setdefault(key, []).append(doc)
+    for election in elections.values():
+        election.sort(key=lambda doc: -doc["diversityIndex"])
+        for rank, doc in enumerate(election, start=1):
+            doc["diversityRank"] = rank
+
+    # metro documents of diversity_index have no localId, local ones have no metroId
+    for id_field, ids in [
+        ("metroId", [doc["metroId"] for doc in docs["metro_district"]]),
+        ("localId", [doc["localId"] for doc in docs["local_district"]]),
+    ]:
+        values = {
+            factor: {id: rng.random() for id in ids}
+            for factor in ("age", "gender", "party")
+        }
+        for id in ids:
+            doc = {id_field: id}
+            for factor, factor_values in values.items():
+                doc[f"{factor}DiversityIndex"] = factor_values[id]
+                doc[f"{factor}DiversityRank"] = 1 + sum(
+                    value > factor_values[id] for value in factor_values.values()
+                )
+            docs["diversity_index"].append(doc)
+    docs["diversity_index"].append(
+        {
+            "national": True,
+            **{
+                f"{factor}DiversityIndex": rng.random()
+                for factor in ("age", "gender", "party")
+            },
+        }
+    )
+    return docs
+
+
+async def seed(client, seed=0):
+    """
+    Replaces the seeded collections of a Motor client with the synthetic dataset
+    and returns the number of documents inserted
+    """
+    inserted = 0
+    for collection, docs in build(seed).items():
+        target = client[DATABASES[collection]][collection]
+        await target.drop()
+        await target.insert_many(docs)
+        inserted += len(docs)
+    return inserted
+
+
+async def seed_app():
+    """
+    Seeds the database of model.MongoDB.client and reloads what the app derives
+    from it, as after an ingest. Returns the number of documents inserted.
+    """
+    from model import MongoDB
+    from utils import dataset, districts, extremes
+
+    inserted = await seed(MongoDB.client.client)
+    await extremes.refresh()
+    await districts.registry.refresh()
+    # a new dataset version also empties the stats cache
+    await dataset.version.refresh()
+    return inserted
+
+
+def use_mongomock():
+    """
+    Makes model.MongoDB connect to an in-memory mongomock-motor client
+    """
+    from mongomock_motor import AsyncMongoMockClient
+    from model import MongoDB
+
+    MongoDB.AsyncIOMotorClient = lambda *args, **kwargs: AsyncMongoMockClient()
+    MongoDB.AsyncIOMotorDatabase = lambda client, name: client[name]
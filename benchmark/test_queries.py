@@ -0,0 +1,95 @@
+from benchmark import seed
+import asyncio
+import pytest
+
+# MongoDB commands one request may send against an empty cache, by route and factor
+# (None for routes without one), counted from the driver's command events so getMore
+# batches are included. Each budget is the query plan the route is written for;
+# raising one should come with a reason in the commit.
+BUDGETS = {
+    # served from the district registry
+    ("/localCouncil/regionInfo", None): 0,
+    ("/localCouncil/partyInfo", None): 0,
+    # the histogram of the region
+    ("/age-hist/", None): 1,
+    ("/age-hist/{metroId}", None): 1,
+    ("/age-hist/{metroId}/{localId}", None): 1,
+    # the histories of every region of the level
+    ("/diversity-index/{level}", "gender"): 1,
+    ("/diversity-index/{level}", "age"): 1,
+    ("/diversity-index/{level}", "party"): 1,
+    # national diversity doc + gender history
+    ("/nationalCouncil/template-data", "gender"): 2,
+    # national diversity doc + age index history + age stat history
+    ("/nationalCouncil/template-data", "age"): 3,
+    # national diversity doc + party history
+    ("/nationalCouncil/template-data", "party"): 2,
+    # the history of the region
+    ("/nationalCouncil/chart-data", "gender"): 1,
+    ("/nationalCouncil/chart-data", "age"): 1,
+    ("/nationalCouncil/chart-data", "party"): 1,
+    # diversity docs of all metros + gender history + elected means of all years
+    ("/metroCouncil/template-data/{metroId}", "gender"): 3,
+    # diversity docs of all metros + age index history + age stat history + extremes
+    ("/metroCouncil/template-data/{metroId}", "age"): 4,
+    # diversity docs of all metros + party history
+    ("/metroCouncil/template-data/{metroId}", "party"): 2,
+    # the union of the three factors' queries, each shared by all years
+    ("/metroCouncil/template-data/{metroId}/batch", None): 7,
+    ("/metroCouncil/chart-data/{metroId}", "gender"): 1,
+    ("/metroCouncil/chart-data/{metroId}", "age"): 1,
+    ("/metroCouncil/chart-data/{metroId}", "party"): 1,
+    # diversity docs of the metro + gender history + elected means of all years
+    ("/localCouncil/template-data/{metroId}/{localId}", "gender"): 3,
+    # diversity docs of the metro + age index history + age stat history + extremes
+    ("/localCouncil/template-data/{metroId}/{localId}", "age"): 4,
+    # diversity docs of the metro + party history
+    ("/localCouncil/template-data/{metroId}/{localId}", "party"): 2,
+    # the union of the three factors' queries, each shared by all years
+    ("/localCouncil/template-data/{metroId}/{localId}/batch", None): 7,
+    ("/localCouncil/chart-data/{metroId}/{localId}", "gender"): 1,
+    ("/localCouncil/chart-data/{metroId}/{localId}", "age"): 1,
+    ("/localCouncil/chart-data/{metroId}/{localId}", "party"): 1,
+    # gender, age and party histories of every local of the metro
+    ("/localCouncil/chart-data/{metroId}", None): 3,
+}
+
+
+async def measure(recorder):
+    """
+    Returns {(route, factor): (commands, path, query)} of the costliest sampled
+    request of every route and factor, each issued alone against an empty cache
+    """
+    from main import app
+    from utils import explain
+
+    async with app.router.lifespan_context(app):
+        await seed.seed_app()
+
+        costliest = {}
+        async for route, factor, path, query, status, commands in (
+            explain.route_commands(app, recorder)
+        ):
+            assert status == 200, f"{path} {query}: {status}"
+            key = (route, factor)
+            if key not in costliest or len(commands) > len(costliest[key][0]):
+                costliest[key] = (commands, path, query)
+    return costliest
+
+
+@pytest.fixture(scope="session")
+def costliest(command_recorder):
+    return asyncio.run(measure(command_recorder))
+
+
+def test_every_route_has_budget(costliest):
+    assert sorted(costliest, key=str) == sorted(BUDGETS, key=str)
+
+
+@pytest.mark.parametrize("route, factor", BUDGETS)
+def test_query_budget(costliest, route, factor):
+    commands, path, query = costliest[(route, factor)]
+    sent = [
+        (next(iter(command)), command[next(iter(command))]) for _, command in commands
+    ]
+    assert len(commands) <= BUDGETS[(route, factor)], f"{path} {query}: {sent}"
@@ -2,7 +2,9 @@ from fastapi import FastAPI, Request
 from dotenv import load_dotenv
 from routers import (
     commonInfo,
+    diversityIndex,
     ageHist,
+    health,
     scrapResultLocal,
     scrapResultMetro,
     scrapResultNational,
@@ -10,14 +12,58 @@ from routers import (
 from contextlib import asynccontextmanager
 from typing import Dict
 from model import MongoDB
+from utils import (
+    compression,
+    dataset,
+    districts,
+    etag,
+    looplag,
+    metrics,
+    snapshot,
+    warmup,
+)
 from model.ResponseType import ChartResponse, GenderInfo, PartyInfo, AgeInfo
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
+import os
 
 
 @asynccontextmanager
 async def initMongo(app: FastAPI):
+    # with a snapshot, every data route is served from it without any database I/O
+    snapshot_path = os.getenv("SNAPSHOT_PATH")
+    if snapshot_path:
+        snapshot.store.load(snapshot_path)
+        watchers = [
+            asyncio.create_task(
+                snapshot.store.watch(float(os.getenv("SNAPSHOT_RELOAD_INTERVAL", "30")))
+            ),
+            asyncio.create_task(looplag.lag.watch()),
+        ]
+        yield
+        for watcher in watchers:
+            watcher.cancel()
+        snapshot.store.close()
+        return
+
     MongoDB.client.connect()
+    if MongoDB.client.settings.min_pool_size:
+        await MongoDB.client.warm_up()
+    if os.getenv("MONGO_ENSURE_INDEXES", "true").lower() == "true":
+        await MongoDB.client.ensure_indexes()
+    await districts.registry.refresh()
+    await dataset.version.refresh()
+    watchers = [
+        asyncio.create_task(districts.registry.watch()),
+        asyncio.create_task(dataset.version.watch()),
+        asyncio.create_task(looplag.lag.watch()),
+    ]
+    if warmup.CACHE_WARMUP:
+        # requests are served meanwhile; readiness waits for warmup.job.ready
+        watchers.append(warmup.job.start(app))
     yield
+    for watcher in watchers:
+        watcher.cancel()
     MongoDB.client.close()
 
 
@@ -30,6 +76,9 @@ origin = [
     "https://diversity.tech4impact.kr",
 ]
 
+app.add_middleware(snapshot.SnapshotMiddleware)
+app.add_middleware(etag.ConditionalCacheMiddleware)
+app.add_middleware(compression.CompressionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origin,
@@ -38,9 +87,14 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(metrics.MetricsMiddleware, routes=app.routes)
+
+app.add_route("/metrics", metrics.metrics, include_in_schema=False)
 
 app.include_router(scrapResultLocal.router)
 app.include_router(scrapResultMetro.router)
 app.include_router(scrapResultNational.router)
 app.include_router(commonInfo.router)
 app.include_router(ageHist.router)
+app.include_router(diversityIndex.router)
+app.include_router(health.router)
@@ -0,0 +1,27 @@
+from pydantic import BaseModel
+from enum import StrEnum
+from model.ScrapResultCommon import FactorType
+from utils.diversity import INDICES
+
+
+class CouncilLevel(StrEnum):
+    national = "national"
+    metro = "metro"
+    local = "local"
+
+
+# every index of the utils.diversity registry
+DiversityIndexType = StrEnum("DiversityIndexType", {name: name for name in INDICES})
+
+
+class RegionDiversityIndex(BaseModel):
+    metroId: int | None = None
+    localId: int | None = None
+    year: int
+    indices: dict[DiversityIndexType, float | None]
+
+
+class DiversityIndexData(BaseModel):
+    level: CouncilLevel
+    factor: FactorType
+    data: list[RegionDiversityIndex]
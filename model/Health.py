@@ -0,0 +1,41 @@
+from pydantic import BaseModel
+
+
+class Liveness(BaseModel):
+    status: str
+    eventLoopLagMs: float
+
+
+class PoolStats(BaseModel):
+    open: int
+    checkedOut: int
+
+
+class MongoHealth(BaseModel):
+    pingMs: float | None = None
+    error: str | None = None
+    maxPoolSize: int
+    # busiest pool: checked out connections / maxPoolSize
+    poolUtilization: float
+    pools: dict[str, PoolStats]
+
+
+class CacheHealth(BaseModel):
+    entries: int
+    hits: int
+    misses: int
+    warmupEnabled: bool
+    warm: bool
+    warmupCompleted: int
+    warmupTotal: int
+    warmupSeconds: float | None = None
+
+
+class Readiness(BaseModel):
+    ready: bool
+    reasons: list[str]
+    eventLoopLagMs: float
+    snapshotVersion: str | None = None
+    datasetVersion: str | None = None
+    mongo: MongoHealth | None = None
+    cache: CacheHealth | None = None
@@ -1,22 +1,201 @@
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure
+from typing import Literal
+import asyncio
+import logging
 import os
 from dotenv import load_dotenv
+from utils import metrics
+from utils.cache import AsyncTTLCache, CachedDatabase
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+
+def _index(*fields, **kwargs):
+    return IndexModel([(field, ASCENDING) for field in fields], **kwargs)
+
+
+# indexes backing every query shape issued by the routers, by database and collection
+INDEXES = {
+    "district": {
+        "metro_district": [_index("metroId")],
+        "local_district": [_index("metroId", "localId")],
+    },
+    "stats": {
+        "gender_hist": [
+            _index(
+                "councilorType", "level", "is_elected", "metroId", "localId", "year"
+            ),
+            _index("councilorType", "level", "is_elected", "year"),
+        ],
+        "party_hist": [
+            _index(
+                "councilorType", "level", "is_elected", "metroId", "localId", "year"
+            ),
+        ],
+        "age_hist": [
+            _index(
+                "councilorType",
+                "level",
+                "metroId",
+                "localId",
+                "method",
+                "is_elected",
+                "year",
+            ),
+        ],
+        "age_stat": [
+            _index(
+                "councilorType", "level", "is_elected", "metroId", "localId", "year"
+            ),
+            _index("councilorType", "level", "is_elected", "year"),
+        ],
+        "diversity_index": [
+            _index("localId", sparse=True),
+            _index("metroId", sparse=True),
+            _index("national", sparse=True),
+        ],
+        "age_diversity_extremes": [_index("councilorType", "year", unique=True)],
+    },
+}
+
+
+class MongoSettings(BaseModel):
+    """
+    Options of the Motor client, read from the MONGO_* environment variables.
+    Unset options keep the driver defaults.
+    """
+
+    model_config = ConfigDict(populate_by_name=True)
+
+    uri: str | None = Field(None, validation_alias="MONGO_CONNECTION_URI")
+    max_pool_size: int = Field(100, ge=0, validation_alias="MONGO_MAX_POOL_SIZE")
+    # connections opened at startup and kept open while idle
+    min_pool_size: int = Field(0, ge=0, validation_alias="MONGO_MIN_POOL_SIZE")
+    max_idle_time_ms: int | None = Field(
+        None, gt=0, validation_alias="MONGO_MAX_IDLE_TIME_MS"
+    )
+    server_selection_timeout_ms: int = Field(
+        30000, gt=0, validation_alias="MONGO_SERVER_SELECTION_TIMEOUT_MS"
+    )
+    connect_timeout_ms: int = Field(
+        20000, gt=0, validation_alias="MONGO_CONNECT_TIMEOUT_MS"
+    )
+    socket_timeout_ms: int | None = Field(
+        None, gt=0, validation_alias="MONGO_SOCKET_TIMEOUT_MS"
+    )
+    # time a request may wait for a free connection of a full pool
+    wait_queue_timeout_ms: int | None = Field(
+        None, gt=0, validation_alias="MONGO_WAIT_QUEUE_TIMEOUT_MS"
+    )
+    # wire compression in order of preference; zstd and snappy need their packages,
+    # unavailable ones are skipped by the driver
+    compressors: list[Literal["zstd", "snappy", "zlib"]] = Field(
+        [], validation_alias="MONGO_COMPRESSORS"
+    )
+    read_preference: Literal[
+        "primary",
+        "primaryPreferred",
+        "secondary",
+        "secondaryPreferred",
+        "nearest",
+    ] = Field("primary", validation_alias="MONGO_READ_PREFERENCE")
+
+    @field_validator("compressors", mode="before")
+    @classmethod
+    def split_compressors(cls, value):
+        if isinstance(value, str):
+            return [name.strip() for name in value.split(",") if name.strip()]
+        return value
+
+    @classmethod
+    def from_env(cls):
+        return cls.model_validate(
+            {
+                field.validation_alias: os.environ[field.validation_alias]
+                for field in cls.model_fields.values()
+                if os.getenv(field.validation_alias)
+            }
+        )
+
+    def client_options(self) -> dict:
+        """
+        Returns the keyword arguments of the Motor client
+        """
+        options = {
+            "maxPoolSize": self.max_pool_size,
+            "minPoolSize": self.min_pool_size,
+            "maxIdleTimeMS": self.max_idle_time_ms,
+            "serverSelectionTimeoutMS": self.server_selection_timeout_ms,
+            "connectTimeoutMS": self.connect_timeout_ms,
+            "socketTimeoutMS": self.socket_timeout_ms,
+            "waitQueueTimeoutMS": self.wait_queue_timeout_ms,
+            "compressors": ",".join(self.compressors) or None,
+            "readPreference": self.read_preference,
+        }
+        return {name: value for name, value in options.items() if value is not None}
+
 
 class MongoDB:
     def __init__(self):
+        self.settings = None
+        self.pool = None
         self.client = None
         self.council_db = None
         self.district_db = None
         self.stats_db = None
+        self.stats_cache = None
 
-    def connect(self):
-        self.client = AsyncIOMotorClient(os.getenv("MONGO_CONNECTION_URI"))
+    def connect(self, settings: MongoSettings | None = None):
+        self.settings = settings or MongoSettings.from_env()
+        self.pool = metrics.PoolMetrics()
+        self.client = AsyncIOMotorClient(
+            self.settings.uri,
+            event_listeners=[metrics.CommandMetrics(), self.pool],
+            **self.settings.client_options(),
+        )
         self.council_db = AsyncIOMotorDatabase(self.client, "council")
         self.district_db = AsyncIOMotorDatabase(self.client, "district")
         self.stats_db = AsyncIOMotorDatabase(self.client, "stats")
+        self.stats_cache = CachedDatabase(
+            self.stats_db,
+            AsyncTTLCache(
+                maxsize=int(os.getenv("STATS_CACHE_MAXSIZE", "4096")),
+                ttl=float(os.getenv("STATS_CACHE_TTL", "600")),
+                listener=metrics.CacheMetrics(),
+            ),
+        )
+
+    async def ensure_indexes(self):
+        """
+        Creates the indexes in INDEXES; existing identical indexes are left untouched
+        """
+        for db_name, collections in INDEXES.items():
+            for collection, indexes in collections.items():
+                try:
+                    await self.client[db_name][collection].create_indexes(indexes)
+                except OperationFailure as e:
+                    logger.warning(
+                        f"Could not create indexes on {db_name}.{collection}: {e}"
+                    )
+
+    async def warm_up(self):
+        """
+        Opens the min_pool_size connections before the first request: concurrent
+        pings each check out their own connection with the read preference of the reads
+        """
+        await asyncio.gather(
+            *[
+                self.client.admin.command(
+                    "ping", read_preference=self.client.read_preference
+                )
+                for _ in range(self.settings.min_pool_size)
+            ]
+        )
 
     def close(self):
         self.client.close()
@@ -1,4 +1,12 @@
 from pydantic import BaseModel
+from model.BasicResponse import ErrorResponse
+from model.ScrapResultCommon import (
+    FactorType,
+    ChartData,
+    GenderChartDataPoint,
+    AgeChartDataPoint,
+    PartyChartDataPoint,
+)
 
 
 # ==============================================
@@ -76,3 +84,29 @@ class PartyTemplateDataLocal(BaseModel):
     prevElected: list[PartyCountDataPoint]
     currentElected: list[PartyCountDataPoint]
     currentCandidate: list[PartyCountDataPoint]
+
+
+class TemplateDataBatchLocal(BaseModel):
+    class TemplateDataBatchItem(BaseModel):
+        factor: FactorType
+        year: int
+        data: ErrorResponse | GenderTemplateDataLocal | AgeTemplateDataLocal | PartyTemplateDataLocal
+
+    metroId: int
+    localId: int
+    items: list[TemplateDataBatchItem]
+
+
+# ==============================================
+# =              Chart Data Types              =
+# ==============================================
+class LocalsChartData(BaseModel):
+    class LocalChartData(BaseModel):
+        localId: int
+        gender: ChartData[GenderChartDataPoint] | None
+        age: ChartData[AgeChartDataPoint] | None
+        party: ChartData[PartyChartDataPoint] | None
+
+    metroId: int
+    year: int
+    locals: list[LocalChartData]
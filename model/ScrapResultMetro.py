@@ -1,4 +1,6 @@
 from pydantic import BaseModel
+from model.BasicResponse import ErrorResponse
+from model.ScrapResultCommon import FactorType
 
 
 # ==============================================
@@ -73,3 +75,13 @@ class PartyTemplateDataMetro(BaseModel):
     prevElected: list[PartyCountDataPoint]
     currentElected: list[PartyCountDataPoint]
     currentCandidate: list[PartyCountDataPoint]
+
+
+class TemplateDataBatchMetro(BaseModel):
+    class TemplateDataBatchItem(BaseModel):
+        factor: FactorType
+        year: int
+        data: ErrorResponse | GenderTemplateDataMetro | AgeTemplateDataMetro | PartyTemplateDataMetro
+
+    metroId: int
+    items: list[TemplateDataBatchItem]
@@ -1,5 +1,7 @@
 from fastapi import APIRouter
 from model import BasicResponse, MongoDB
+from utils import districts
+from utils.response import ModelJSONRoute
 from model.AgeHist import (
     AgeHistDataTypes,
     AgeHistMethodTypes,
@@ -9,14 +11,14 @@ from model.AgeHist import (
 )
 
 
-router = APIRouter(prefix="/age-hist", tags=["age-hist"])
+router = APIRouter(prefix="/age-hist", tags=["age-hist"], route_class=ModelJSONRoute)
 
 
 @router.get("/")
 async def getNationalAgeHistData(
     ageHistType: AgeHistDataTypes, year: int, method: AgeHistMethodTypes
 ) -> BasicResponse.ErrorResponse | NationalAgeHistData:
-    histogram = await MongoDB.client.stats_db["age_hist"].find_one(
+    histogram = await MongoDB.client.stats_cache["age_hist"].find_one(
         {
             "councilorType": "national_councilor",
             "is_elected": ageHistType == AgeHistDataTypes.elected,
@@ -41,12 +43,7 @@ async def getNationalAgeHistData(
 async def getMetroAgeHistData(
     metroId: int, ageHistType: AgeHistDataTypes, year: int, method: AgeHistMethodTypes
 ) -> BasicResponse.ErrorResponse | MetroAgeHistData:
-    if (
-        await MongoDB.client.district_db["metro_district"].find_one(
-            {"metroId": metroId}
-        )
-        is None
-    ):
+    if not districts.registry.has_metro(metroId):
         return BasicResponse.ErrorResponse.model_validate(
             {
                 "error": "RegionCodeError",
@@ -55,7 +52,7 @@ async def getMetroAgeHistData(
             }
         )
 
-    histogram = await MongoDB.client.stats_db["age_hist"].find_one(
+    histogram = await MongoDB.client.stats_cache["age_hist"].find_one(
         {
             "level": 1,
             "councilorType": "metro_councilor",
@@ -88,12 +85,7 @@ async def getLocalAgeHistData(
     year: int,
     method: AgeHistMethodTypes,
 ) -> BasicResponse.ErrorResponse | LocalAgeHistData:
-    if (
-        await MongoDB.client.district_db["local_district"].find_one(
-            {"metroId": metroId, "localId": localId}
-        )
-        is None
-    ):
+    if not districts.registry.has_local(metroId, localId):
         return BasicResponse.ErrorResponse.model_validate(
             {
                 "error": "RegionCodeError",
@@ -102,7 +94,7 @@ async def getLocalAgeHistData(
             }
         )
 
-    histogram = await MongoDB.client.stats_db["age_hist"].find_one(
+    histogram = await MongoDB.client.stats_cache["age_hist"].find_one(
         {
             "level": 2,
             "councilorType": "local_councilor",
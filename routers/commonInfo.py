@@ -1,43 +1,66 @@
-from fastapi import APIRouter
-from model import MongoDB, CommonInfo
+from fastapi import APIRouter, Request, Response
+from pydantic import TypeAdapter
+from model import CommonInfo
+from utils import districts
+from utils.etag import strong_etag, not_modified
 
 router = APIRouter(prefix="/localCouncil", tags=["localCouncil"])
 
+# route name -> (registry version, body, etag); rebuilt when the registry refreshes
+prebuilt = {}
 
-@router.get("/regionInfo")
-async def getRegionInfo() -> list[CommonInfo.RegionInfo]:
-    regions = []
-    async for metro in MongoDB.client.district_db.get_collection(
-        "metro_district"
-    ).find():
-        local_districts = []
-        async for local in MongoDB.client.district_db.get_collection(
-            "local_district"
-        ).find({"metroId": metro["metroId"]}):
-            local_districts.append(
-                CommonInfo.LocalInfo.model_validate(
-                    {"name": local["wiwName"], "id": local["localId"]}
-                )
-            )
-        regions.append(
+
+def prebuiltResponse(request: Request, name: str, build) -> Response:
+    """
+    Serves the JSON body returned by `build`, built once per registry version,
+    with a strong ETag so that clients can revalidate with If-None-Match
+    """
+    version = districts.registry.version
+    if name not in prebuilt or prebuilt[name][0] != version:
+        body = build()
+        prebuilt[name] = (version, body, strong_etag(body))
+    _, body, etag = prebuilt[name]
+
+    if not_modified(request.headers, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(body, media_type="application/json", headers={"ETag": etag})
+
+
+@router.get("/regionInfo", response_model=list[CommonInfo.RegionInfo])
+async def getRegionInfo(request: Request) -> Response:
+    def build():
+        regions = [
             CommonInfo.RegionInfo.model_validate(
                 {
                     "name": metro["sdName"],
-                    "id": metro["metroId"],
-                    "local": local_districts,
+                    "id": metroId,
+                    "local": [
+                        {
+                            "name": districts.registry.locals[(metroId, localId)][
+                                "wiwName"
+                            ],
+                            "id": localId,
+                        }
+                        for localId in districts.registry.local_ids(metroId)
+                    ],
                 }
             )
-        )
-    return regions
+            for metroId, metro in districts.registry.metros.items()
+        ]
+        return TypeAdapter(list[CommonInfo.RegionInfo]).dump_json(regions)
+
+    return prebuiltResponse(request, "regionInfo", build)
 
 
-@router.get("/partyInfo")
-async def getPartyInfo() -> list[CommonInfo.PartyInfo]:
-    parties = []
-    async for party in MongoDB.client.district_db.get_collection("party").find():
-        parties.append(
+@router.get("/partyInfo", response_model=list[CommonInfo.PartyInfo])
+async def getPartyInfo(request: Request) -> Response:
+    def build():
+        parties = [
             CommonInfo.PartyInfo.model_validate(
                 {"name": party["name"], "color": party["color"]}
             )
-        )
-    return parties
+            for party in districts.registry.parties
+        ]
+        return TypeAdapter(list[CommonInfo.PartyInfo]).dump_json(parties)
+
+    return prebuiltResponse(request, "partyInfo", build)
@@ -0,0 +1,97 @@
+from fastapi import APIRouter, Query
+from model.BasicResponse import ErrorResponse, REGION_CODE_ERR
+from model.MongoDB import client
+from model.ScrapResultCommon import FactorType
+from model.DiversityIndex import CouncilLevel, DiversityIndexType, DiversityIndexData
+from utils import diversity, districts, parties
+from utils.response import ModelJSONRoute
+import math
+
+
+router = APIRouter(
+    prefix="/diversity-index", tags=["diversity-index"], route_class=ModelJSONRoute
+)
+
+# CouncilLevel -> (councilorType, level)
+COUNCILS = {
+    CouncilLevel.national: ("national_councilor", 0),
+    CouncilLevel.metro: ("metro_councilor", 1),
+    CouncilLevel.local: ("local_councilor", 2),
+}
+
+
+@router.get("/{level}")
+async def getDiversityIndices(
+    level: CouncilLevel,
+    factor: FactorType,
+    index: list[DiversityIndexType] = Query(None),
+    q: float = 2.0,
+    metroId: int | None = None,
+    year: int | None = None,
+) -> ErrorResponse | DiversityIndexData:
+    """
+    Computes the requested diversity indices (all by default) of the elected councilors
+    of every region of a council level, for every election year or only `year`.
+    `q` is the order of the Hill number.
+    """
+    if metroId is not None and not districts.registry.has_metro(metroId):
+        return ErrorResponse.model_validate(
+            {
+                "error": "RegionCodeError",
+                "code": REGION_CODE_ERR,
+                "message": f"No metro district with metroId {metroId}.",
+            }
+        )
+
+    councilorType, level_number = COUNCILS[level]
+    query = {"councilorType": councilorType, "level": level_number, "is_elected": True}
+    if metroId is not None:
+        query["metroId"] = metroId
+    if year is not None:
+        query["year"] = year
+    match factor:
+        case FactorType.gender:
+            docs = await client.stats_cache["gender_hist"].find(query)
+        case FactorType.age:
+            docs = await client.stats_cache["age_hist"].find(
+                {**query, "method": "equal"}
+            )
+        case FactorType.party:
+            docs = await client.stats_cache["party_hist"].find(
+                query, parties.layout.projection()
+            )
+
+    # one histogram per region and year; the first document wins, like the chart routes
+    regions = {}
+    for doc in docs:
+        regions.setdefault((doc["year"], doc.get("metroId"), doc.get("localId")), doc)
+    keys = sorted(regions, key=lambda key: tuple(-1 if k is None else k for k in key))
+    names = index or list(DiversityIndexType)
+    if keys:
+        matrix, _ = diversity.count_matrix(
+            [diversity.factor_counts(factor, regions[key]) for key in keys]
+        )
+        values = diversity.compute(matrix, names, q=q)
+
+    return DiversityIndexData.model_validate(
+        {
+            "level": level,
+            "factor": factor,
+            "data": [
+                {
+                    "year": region_year,
+                    "metroId": region_metroId,
+                    "localId": region_localId,
+                    "indices": {
+                        name: None
+                        if math.isnan(values[name][row])
+                        else float(values[name][row])
+                        for name in names
+                    },
+                }
+                for row, (region_year, region_metroId, region_localId) in enumerate(
+                    keys
+                )
+            ],
+        }
+    )
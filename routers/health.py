@@ -0,0 +1,110 @@
+from fastapi import APIRouter, Response
+from model.Health import CacheHealth, Liveness, MongoHealth, Readiness
+from model.MongoDB import client
+from utils import dataset, districts, looplag, snapshot, warmup
+import asyncio
+import os
+import time
+
+router = APIRouter(tags=["health"])
+
+# a Mongo ping slower than this makes the instance not ready (seconds)
+READY_PING_TIMEOUT = float(os.getenv("READY_PING_TIMEOUT", "2"))
+# recent event loop lag above which the instance is not ready (milliseconds)
+READY_MAX_LOOP_LAG_MS = float(os.getenv("READY_MAX_LOOP_LAG_MS", "500"))
+
+
+async def mongoHealth() -> MongoHealth:
+    pingMs, error = None, None
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(
+            client.client.admin.command("ping"), timeout=READY_PING_TIMEOUT
+        )
+        pingMs = (time.perf_counter() - started) * 1000
+    except TimeoutError:
+        error = f"ping timed out after {READY_PING_TIMEOUT}s"
+    except Exception as e:
+        error = repr(e)
+
+    max_pool_size = client.settings.max_pool_size
+    pools = {address: dict(pool) for address, pool in client.pool.pools.items()}
+    return MongoHealth.model_validate(
+        {
+            "pingMs": pingMs,
+            "error": error,
+            "maxPoolSize": max_pool_size,
+            "poolUtilization": max(
+                (pool["checkedOut"] / max_pool_size for pool in pools.values()),
+                default=0.0,
+            )
+            if max_pool_size
+            else 0.0,
+            "pools": pools,
+        }
+    )
+
+
+def cacheHealth() -> CacheHealth:
+    cache = client.stats_cache.cache
+    return CacheHealth.model_validate(
+        {
+            "entries": len(cache),
+            "hits": cache.hits,
+            "misses": cache.misses,
+            "warmupEnabled": warmup.job.enabled,
+            "warm": warmup.job.ready,
+            "warmupCompleted": warmup.job.completed,
+            "warmupTotal": warmup.job.total,
+            "warmupSeconds": warmup.job.duration,
+        }
+    )
+
+
+@router.get("/healthz")
+async def getHealth() -> Liveness:
+    """
+    Liveness: the process is up and its event loop answers
+    """
+    return Liveness.model_validate(
+        {"status": "ok", "eventLoopLagMs": looplag.lag.max_ms}
+    )
+
+
+@router.get(
+    "/readyz", responses={503: {"model": Readiness, "description": "Not ready"}}
+)
+async def getReadiness(response: Response) -> Readiness:
+    """
+    Readiness: answers 503 with the reasons while the instance should not get
+    traffic, i.e. while MongoDB is unreachable or slow, the caches are cold or
+    the event loop lagged recently
+    """
+    reasons = []
+    lag = looplag.lag.max_ms
+    if lag > READY_MAX_LOOP_LAG_MS:
+        reasons.append(f"event loop lag {lag:.0f}ms")
+
+    readiness = {"eventLoopLagMs": lag}
+    if snapshot.store.current is not None:
+        readiness["snapshotVersion"] = snapshot.store.current.version
+    elif client.client is None:
+        reasons.append("not connected to MongoDB")
+    else:
+        readiness["datasetVersion"] = dataset.version.value
+        readiness["mongo"] = await mongoHealth()
+        readiness["cache"] = cacheHealth()
+        if readiness["mongo"].error is not None:
+            reasons.append(f"MongoDB {readiness['mongo'].error}")
+        if not districts.registry.loaded:
+            reasons.append("district registry not loaded")
+        if not warmup.job.ready:
+            reasons.append(
+                f"cache warmup {warmup.job.completed}/{warmup.job.total} requests"
+            )
+
+    if reasons:
+        response.status_code = 503
+    return Readiness.model_validate(
+        {**readiness, "ready": not reasons, "reasons": reasons}
+    )
@@ -1,5 +1,5 @@
 from typing import TypeVar
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, Query
 from model.BasicResponse import ErrorResponse, REGION_CODE_ERR, NO_DATA_ERROR_RESPONSE
 from model.MongoDB import client
 from model.ScrapResultCommon import (
@@ -13,25 +13,31 @@ from model.ScrapResultLocal import (
     GenderTemplateDataLocal,
     AgeTemplateDataLocal,
     PartyTemplateDataLocal,
+    TemplateDataBatchLocal,
+    LocalsChartData,
+)
+from utils import districts, diversity, extremes, histogram, parties
+from utils.response import ModelJSONRoute
+from utils.queries import (
+    age_index_history,
+    gather,
+    gender_means,
+    party_history,
+    region_history,
 )
-from utils import diversity
-
 
-router = APIRouter(prefix="/localCouncil", tags=["localCouncil"])
 
-AGE_STAIR = 10
+router = APIRouter(
+    prefix="/localCouncil", tags=["localCouncil"], route_class=ModelJSONRoute
+)
 
 
-@router.get("/template-data/{metroId}/{localId}")
-async def getLocalTemplateData(
-    metroId: int, localId: int, factor: FactorType, year: int = 2022
-) -> ErrorResponse | GenderTemplateDataLocal | AgeTemplateDataLocal | PartyTemplateDataLocal:
-    if (
-        await client.district_db["local_district"].find_one(
-            {"localId": localId, "metroId": metroId}
-        )
-        is None
-    ):
+async def getLocalStat(metroId: int, localId: int) -> ErrorResponse | dict:
+    """
+    Checks that the local district exists and returns its diversity_index document,
+    or the error response to return
+    """
+    if not districts.registry.has_local(metroId, localId):
         return ErrorResponse.model_validate(
             {
                 "error": "RegionCodeError",
@@ -40,104 +46,128 @@ async def getLocalTemplateData(
             }
         )
 
-    local_stat = await client.stats_db["diversity_index"].find_one({"localId": localId})
-
+    # the documents of the whole metro are shared with the age ranking paragraph
+    local_stats = await client.stats_cache["diversity_index"].find(
+        {"localId": {"$in": districts.registry.local_ids(metroId)}}
+    )
+    local_stat = next((doc for doc in local_stats if doc["localId"] == localId), None)
     if local_stat is None:
         return NO_DATA_ERROR_RESPONSE
+    return local_stat
 
-    match factor:
-        case FactorType.gender:
-            years = list(
-                {
-                    doc["year"]
-                    async for doc in client.stats_db["gender_hist"].find(
-                        {
-                            "councilorType": "local_councilor",
-                            "level": 2,
-                            "is_elected": True,
-                            "localId": localId,
-                            "metroId": metroId,
-                        }
-                    )
-                }
-            )
-            years.sort()
-            assert len(years) >= 2
-
-            year_index = years.index(year)
-            if year_index == 0:
-                return NO_DATA_ERROR_RESPONSE
 
-            current = await client.stats_db["gender_hist"].find_one(
+@router.get("/template-data/{metroId}/{localId}")
+async def getLocalTemplateData(
+    metroId: int, localId: int, factor: FactorType, year: int = 2022
+) -> ErrorResponse | GenderTemplateDataLocal | AgeTemplateDataLocal | PartyTemplateDataLocal:
+    local_stat = await getLocalStat(metroId, localId)
+    if isinstance(local_stat, ErrorResponse):
+        return local_stat
+    return await buildLocalTemplateData(metroId, localId, factor, year, local_stat)
+
+
+@router.get("/template-data/{metroId}/{localId}/batch")
+async def getLocalTemplateDataBatch(
+    metroId: int,
+    localId: int,
+    factors: list[FactorType] = Query(None),
+    years: list[int] = Query(None),
+) -> ErrorResponse | TemplateDataBatchLocal:
+    """
+    Returns the template data of several factors and years of a local district at once.
+    Omitting `factors` or `years` selects every factor or every election year.
+    """
+    local_stat = await getLocalStat(metroId, localId)
+    if isinstance(local_stat, ErrorResponse):
+        return local_stat
+
+    factors = list(dict.fromkeys(factors or FactorType))
+    available_years = dict(
+        zip(
+            factors,
+            await gather(
+                *[localFactorYears(metroId, localId, factor) for factor in factors]
+            ),
+        )
+    )
+    years = sorted(set(years or [y for ys in available_years.values() for y in ys]))
+    # years without data of a factor in this district are answered with NoDataError
+    keys = [
+        (factor, year)
+        for factor in factors
+        for year in years
+        if year in available_years[factor]
+    ]
+    results = await gather(
+        *[
+            buildLocalTemplateData(metroId, localId, factor, year, local_stat)
+            for factor, year in keys
+        ]
+    )
+    data = dict(zip(keys, results))
+    return TemplateDataBatchLocal.model_validate(
+        {
+            "metroId": metroId,
+            "localId": localId,
+            "items": [
                 {
-                    "councilorType": "local_councilor",
-                    "level": 2,
-                    "is_elected": True,
-                    "localId": localId,
-                    "metroId": metroId,
-                    "year": years[year_index],
+                    "factor": factor,
+                    "year": year,
+                    "data": data.get((factor, year), NO_DATA_ERROR_RESPONSE),
                 }
-            )
+                for factor in factors
+                for year in years
+            ],
+        }
+    )
+
+
+async def localFactorYears(metroId: int, localId: int, factor: FactorType) -> list[int]:
+    """
+    Returns the years buildLocalTemplateData finds data of `factor` for, read with
+    the same (cached) queries
+    """
+    if factor == FactorType.age:
+        years, _, _ = await age_index_history(
+            "local_councilor", level=2, metroId=metroId, localId=localId
+        )
+    elif factor == FactorType.party:
+        years, _, _ = await party_history(
+            "local_councilor", 2, metroId=metroId, localId=localId
+        )
+    else:
+        years, _, _ = await region_history(
+            "gender_hist", "local_councilor", 2, metroId=metroId, localId=localId
+        )
+    return years
 
-            current_candidate = await client.stats_db["gender_hist"].find_one(
-                {
-                    "councilorType": "local_councilor",
-                    "level": 2,
-                    "is_elected": False,
-                    "localId": localId,
-                    "metroId": metroId,
-                    "year": years[year_index],
-                }
-            )
 
-            previous = await client.stats_db["gender_hist"].find_one(
-                {
-                    "councilorType": "local_councilor",
-                    "level": 2,
-                    "is_elected": True,
-                    "localId": localId,
-                    "metroId": metroId,
-                    "year": years[year_index - 1],
-                }
+async def buildLocalTemplateData(
+    metroId: int, localId: int, factor: FactorType, year: int, local_stat: dict
+) -> ErrorResponse | GenderTemplateDataLocal | AgeTemplateDataLocal | PartyTemplateDataLocal:
+    match factor:
+        case FactorType.gender:
+            (years, elected, candidate), means = await gather(
+                region_history(
+                    "gender_hist",
+                    "local_councilor",
+                    2,
+                    metroId=metroId,
+                    localId=localId,
+                ),
+                gender_means("local_councilor", 2),
             )
+            assert len(years) >= 2
 
-            previous_candidate = await client.stats_db["gender_hist"].find_one(
-                {
-                    "councilorType": "local_councilor",
-                    "level": 2,
-                    "is_elected": False,
-                    "localId": localId,
-                    "metroId": metroId,
-                    "year": years[year_index],
-                }
-            )
+            year_index = years.index(year)
+            if year_index == 0 or year not in candidate:
+                return NO_DATA_ERROR_RESPONSE
 
-            current_all = (
-                await client.stats_db["gender_hist"]
-                .aggregate(
-                    [
-                        {
-                            "$match": {
-                                "councilorType": "local_councilor",
-                                "level": 2,
-                                "is_elected": True,
-                                "year": years[year_index],
-                            }
-                        },
-                        {
-                            "$group": {
-                                "_id": None,
-                                "male_tot": {"$sum": "$남"},
-                                "female_tot": {"$sum": "$여"},
-                                "district_cnt": {"$sum": 1},
-                            }
-                        },
-                    ]
-                )
-                .to_list(500)
-            )
-            assert len(current_all) == 1
-            current_all = current_all[0]
+            current = elected[years[year_index]][0]
+            current_candidate = candidate[years[year_index]][0]
+            previous = elected[years[year_index - 1]][0]
+            previous_candidate = candidate[years[year_index]][0]
+            current_all = means[years[year_index]]
 
             return GenderTemplateDataLocal.model_validate(
                 {
@@ -177,134 +207,57 @@ async def getLocalTemplateData(
             # ============================
             age_diversity_index = local_stat["ageDiversityIndex"]
 
-            localIds_of_same_metroId = [
-                doc["localId"]
-                async for doc in client.district_db["local_district"].find(
-                    {"metroId": metroId}
-                )
-            ]
-            all_indices = (
-                await client.stats_db["diversity_index"]
-                .find({"localId": {"$in": localIds_of_same_metroId}})
-                .to_list(500)
-            )
-            all_indices.sort(key=lambda x: x["ageDiversityRank"])
-
-            # ============================
-            #    indexHistoryParagraph
-            # ============================
-            years = list(
-                {
-                    doc["year"]
-                    async for doc in client.stats_db["age_hist"].find(
-                        {"councilorType": "local_councilor"}
-                    )
-                }
-            )
-            years.sort()
-
-            year_index = years.index(year)
-            if year_index == 0:
-                return NO_DATA_ERROR_RESPONSE
-
-            history_candidate = [
-                await client.stats_db["age_hist"].find_one(
-                    {
-                        "year": year,
-                        "level": 2,
-                        "councilorType": "local_councilor",
-                        "is_elected": False,
-                        "method": "equal",
-                        "metroId": metroId,
-                        "localId": localId,
-                    }
-                )
-                for year in years
-            ]
-            history_elected = [
-                await client.stats_db["age_hist"].find_one(
-                    {
-                        "year": year,
-                        "level": 2,
-                        "councilorType": "local_councilor",
-                        "is_elected": True,
-                        "method": "equal",
-                        "metroId": metroId,
-                        "localId": localId,
-                    }
+            async def same_metro_indices():
+                return sorted(
+                    await client.stats_cache["diversity_index"].find(
+                        {"localId": {"$in": districts.registry.local_ids(metroId)}}
+                    ),
+                    key=lambda x: x["ageDiversityRank"],
                 )
-                for year in years
-            ]
 
             # ============================
             #    ageHistogramParagraph
             # ============================
-            age_stat_elected = (
-                await client.stats_db["age_stat"]
-                .aggregate(
-                    [
-                        {
-                            "$match": {
-                                "level": 2,
-                                "councilorType": "local_councilor",
-                                "is_elected": True,
-                                "metroId": metroId,
-                                "localId": localId,
-                            }
-                        },
-                        {"$sort": {"year": -1}},
-                        {"$limit": 1},
-                    ]
-                )
-                .to_list(500)
-            )[0]
             most_recent_year = year
-            age_stat_candidate = await client.stats_db["age_stat"].find_one(
-                {
-                    "level": 2,
-                    "councilorType": "local_councilor",
-                    "is_elected": False,
-                    "metroId": metroId,
-                    "localId": localId,
-                    "year": most_recent_year,
-                }
-            )
 
-            areas_sorted = (
-                client.stats_db["diversity_index"]
-                .find({"localId": {"$exists": True}})
-                .sort("ageDiversityRank")
+            # the queries of all three paragraphs are independent of each other
+            (
+                all_indices,
+                (years, history_candidate, history_elected),
+                (stat_years, stat_elected, stat_candidate),
+                area_extremes,
+            ) = await gather(
+                same_metro_indices(),
+                age_index_history(
+                    "local_councilor", level=2, metroId=metroId, localId=localId
+                ),
+                region_history(
+                    "age_stat",
+                    "local_councilor",
+                    2,
+                    metroId=metroId,
+                    localId=localId,
+                ),
+                extremes.get("local_councilor", most_recent_year),
             )
-            async for area in areas_sorted:
-                divArea = await client.stats_db["age_stat"].find_one(
-                    {
-                        "level": 2,
-                        "councilorType": "local_councilor",
-                        "is_elected": True,
-                        "localId": area["localId"],
-                        "year": most_recent_year,
-                    }
-                )
-                if divArea is not None:
-                    break
 
-            if divArea is None:
+            year_index = years.index(year)
+            if year_index == 0:
                 return NO_DATA_ERROR_RESPONSE
 
-            uniArea_id = (
-                await client.stats_db["diversity_index"].find_one(
-                    {"localId": {"$exists": True}, "ageDiversityRank": 226}
-                )
-            )["localId"]
-            uniArea = await client.stats_db["age_stat"].find_one(
-                {
-                    "level": 2,
-                    "councilorType": "local_councilor",
-                    "is_elected": True,
-                    "localId": uniArea_id,
-                    "year": most_recent_year,
-                }
-            )
+            # a year or history entry missing one of its documents has no template
+            if (
+                area_extremes is None
+                or not stat_years
+                or most_recent_year not in stat_candidate
+                or None in history_candidate
+                or None in history_elected
+            ):
+                return NO_DATA_ERROR_RESPONSE
+            # the elected histogram is that of the latest election, whatever `year`
+            age_stat_elected = stat_elected[stat_years[-1]][0]
+            age_stat_candidate = stat_candidate[most_recent_year][0]
+            divArea, uniArea = area_extremes["divArea"], area_extremes["uniArea"]
 
             return AgeTemplateDataLocal.model_validate(
                 {
@@ -354,12 +307,12 @@ async def getLocalTemplateData(
                         "firstQuintile": age_stat_elected["data"][0]["firstquintile"],
                         "lastQuintile": age_stat_elected["data"][0]["lastquintile"],
                         "divArea": {
-                            "localId": divArea["localId"],
+                            "localId": divArea["id"],
                             "firstQuintile": divArea["data"][0]["firstquintile"],
                             "lastQuintile": divArea["data"][0]["lastquintile"],
                         },
                         "uniArea": {
-                            "localId": uniArea_id,
+                            "localId": uniArea["id"],
                             "firstQuintile": uniArea["data"][0]["firstquintile"],
                             "lastQuintile": uniArea["data"][0]["lastquintile"],
                         },
@@ -369,84 +322,18 @@ async def getLocalTemplateData(
 
         case FactorType.party:
             party_diversity_index = local_stat["partyDiversityIndex"]
-            years = list(
-                {
-                    doc["year"]
-                    async for doc in client.stats_db["party_hist"].find(
-                        {
-                            "councilorType": "local_councilor",
-                            "level": 2,
-                            "is_elected": True,
-                            "localId": localId,
-                            "metroId": metroId,
-                        }
-                    )
-                }
+            years, elected, candidate = await party_history(
+                "local_councilor", 2, metroId=metroId, localId=localId
             )
-            years.sort()
             assert len(years) >= 2
 
             year_index = years.index(year)
             if year_index == 0:
                 return NO_DATA_ERROR_RESPONSE
 
-            current_elected = client.stats_db["party_hist"].find(
-                {
-                    "councilorType": "local_councilor",
-                    "level": 2,
-                    "is_elected": True,
-                    "localId": localId,
-                    "metroId": metroId,
-                    "year": years[year_index],
-                },
-                {
-                    "_id": 0,
-                    "councilorType": 0,
-                    "level": 0,
-                    "is_elected": 0,
-                    "localId": 0,
-                    "metroId": 0,
-                    "year": 0,
-                },
-            )
-            current_candidate = client.stats_db["party_hist"].find(
-                {
-                    "councilorType": "local_councilor",
-                    "level": 2,
-                    "is_elected": False,
-                    "localId": localId,
-                    "metroId": metroId,
-                    "year": years[year_index],
-                },
-                {
-                    "_id": 0,
-                    "councilorType": 0,
-                    "level": 0,
-                    "is_elected": 0,
-                    "localId": 0,
-                    "metroId": 0,
-                    "year": 0,
-                },
-            )
-            previous = client.stats_db["party_hist"].find(
-                {
-                    "councilorType": "local_councilor",
-                    "level": 2,
-                    "is_elected": True,
-                    "localId": localId,
-                    "metroId": metroId,
-                    "year": years[year_index - 1],
-                },
-                {
-                    "_id": 0,
-                    "councilorType": 0,
-                    "level": 0,
-                    "is_elected": 0,
-                    "localId": 0,
-                    "metroId": 0,
-                    "year": 0,
-                },
-            )
+            current_elected = elected[years[year_index]]
+            current_candidate = candidate.get(years[year_index], [])
+            previous = elected[years[year_index - 1]]
 
             return PartyTemplateDataLocal.model_validate(
                 {
@@ -454,19 +341,19 @@ async def getLocalTemplateData(
                     "localId": localId,
                     "partyDiversityIndex": party_diversity_index,
                     "prevElected": [
-                        {"party": party, "count": doc[party]}
-                        async for doc in previous
-                        for party in doc
+                        count
+                        for doc in previous
+                        for count in diversity.party_counts(doc)
                     ],
                     "currentElected": [
-                        {"party": party, "count": doc[party]}
-                        async for doc in current_elected
-                        for party in doc
+                        count
+                        for doc in current_elected
+                        for count in diversity.party_counts(doc)
                     ],
                     "currentCandidate": [
-                        {"party": party, "count": doc[party]}
-                        async for doc in current_candidate
-                        for party in doc
+                        count
+                        for doc in current_candidate
+                        for count in diversity.party_counts(doc)
                     ],
                 }
             )
@@ -474,16 +361,15 @@ async def getLocalTemplateData(
 
 @router.get("/chart-data/{metroId}/{localId}")
 async def getLocalChartData(
-    metroId: int, localId: int, factor: FactorType, year: int = 2022
+    metroId: int,
+    localId: int,
+    factor: FactorType,
+    year: int = 2022,
+    bins: dict = Depends(histogram.age_bins),
 ) -> ErrorResponse | ChartData[GenderChartDataPoint] | ChartData[
     AgeChartDataPoint
 ] | ChartData[PartyChartDataPoint]:
-    if (
-        await client.district_db["local_district"].find_one(
-            {"localId": localId, "metroId": metroId}
-        )
-        is None
-    ):
+    if not districts.registry.has_local(metroId, localId):
         return ErrorResponse.model_validate(
             {
                 "error": "RegionCodeError",
@@ -495,8 +381,7 @@ async def getLocalChartData(
     match factor:
         case FactorType.gender:
             gender_cnt = (
-                await client.stats_db["gender_hist"]
-                .find(
+                await client.stats_cache["gender_hist"].find(
                     {
                         "councilorType": "local_councilor",
                         "level": 2,
@@ -504,25 +389,16 @@ async def getLocalChartData(
                         "localId": localId,
                         "metroId": metroId,
                         "year": year,
-                    }
+                    },
+                    limit=1,
                 )
-                .limit(1)
-                .to_list(5)
             )[0]
 
-            return ChartData[GenderChartDataPoint].model_validate(
-                {
-                    "data": [
-                        {"gender": "남", "count": gender_cnt["남"]},
-                        {"gender": "여", "count": gender_cnt["여"]},
-                    ]
-                }
-            )
+            return genderChartData(gender_cnt)
 
         case FactorType.age:
             age_cnt = (
-                await client.stats_db["age_hist"]
-                .find(
+                await client.stats_cache["age_hist"].find(
                     {
                         "councilorType": "local_councilor",
                         "level": 2,
@@ -531,32 +407,15 @@ async def getLocalChartData(
                         "localId": localId,
                         "metroId": metroId,
                         "year": year,
-                    }
+                    },
+                    limit=1,
                 )
-                .limit(1)
-                .to_list(5)
             )[0]
-            age_list = [
-                age["minAge"] for age in age_cnt["data"] for _ in range(age["count"])
-            ]
-            age_stair = diversity.count(age_list, stair=AGE_STAIR)
-            return ChartData[AgeChartDataPoint].model_validate(
-                {
-                    "data": [
-                        {
-                            "minAge": age,
-                            "maxAge": age + AGE_STAIR,
-                            "count": age_stair[age],
-                        }
-                        for age in age_stair
-                    ]
-                }
-            )
+            return ageChartData(age_cnt, bins)
 
         case FactorType.party:
             party_count = (
-                await client.stats_db["party_hist"]
-                .find(
+                await client.stats_cache["party_hist"].find(
                     {
                         "councilorType": "local_councilor",
                         "level": 2,
@@ -564,26 +423,111 @@ async def getLocalChartData(
                         "localId": localId,
                         "metroId": metroId,
                         "year": year,
-                    }
+                    },
+                    parties.layout.projection(),
+                    limit=1,
                 )
-                .limit(1)
-                .to_list(5)
             )[0]
-            return ChartData[PartyChartDataPoint].model_validate(
+            return partyChartData(party_count)
+
+
+def genderChartData(gender_cnt: dict) -> ChartData[GenderChartDataPoint]:
+    return ChartData[GenderChartDataPoint].model_validate(
+        {
+            "data": [
+                {"gender": "남", "count": gender_cnt["남"]},
+                {"gender": "여", "count": gender_cnt["여"]},
+            ]
+        }
+    )
+
+
+def ageChartData(age_cnt: dict, bins: dict) -> ChartData[AgeChartDataPoint]:
+    return ChartData[AgeChartDataPoint].model_validate(
+        {"data": histogram.rebin(age_cnt["data"], **bins)}
+    )
+
+
+def partyChartData(party_count: dict) -> ChartData[PartyChartDataPoint]:
+    return ChartData[PartyChartDataPoint].model_validate(
+        {"data": diversity.party_counts(party_count)}
+    )
+
+
+async def noDocs():
+    return []
+
+
+@router.get("/chart-data/{metroId}")
+async def getMetroLocalsChartData(
+    metroId: int,
+    factors: list[FactorType] = Query(None),
+    year: int = 2022,
+    bins: dict = Depends(histogram.age_bins),
+) -> ErrorResponse | LocalsChartData:
+    """
+    Returns the chart data of every local district of a metro district at once.
+    Omitting `factors` selects every factor; districts without data of a factor get null.
+    """
+    query = {
+        "councilorType": "local_councilor",
+        "level": 2,
+        "is_elected": True,
+        "metroId": metroId,
+        "year": year,
+    }
+    factors = set(factors or FactorType)
+    if not districts.registry.has_metro(metroId):
+        return ErrorResponse.model_validate(
+            {
+                "error": "RegionCodeError",
+                "code": REGION_CODE_ERR,
+                "message": f"No metro district with metroId {metroId}.",
+            }
+        )
+
+    gender_docs, age_docs, party_docs = await gather(
+        client.stats_cache["gender_hist"].find(query)
+        if FactorType.gender in factors
+        else noDocs(),
+        client.stats_cache["age_hist"].find({**query, "method": "equal"})
+        if FactorType.age in factors
+        else noDocs(),
+        client.stats_cache["party_hist"].find(query, parties.layout.projection())
+        if FactorType.party in factors
+        else noDocs(),
+    )
+
+    def byLocalId(docs):
+        # keeps the first document of each local district, like the single-district route
+        found = {}
+        for doc in docs:
+            found.setdefault(doc["localId"], doc)
+        return found
+
+    gender_cnt, age_cnt, party_count = (
+        byLocalId(gender_docs),
+        byLocalId(age_docs),
+        byLocalId(party_docs),
+    )
+    return LocalsChartData.model_validate(
+        {
+            "metroId": metroId,
+            "year": year,
+            "locals": [
                 {
-                    "data": [
-                        {"party": party, "count": party_count[party]}
-                        for party in party_count
-                        if party
-                        not in [
-                            "_id",
-                            "councilorType",
-                            "level",
-                            "is_elected",
-                            "localId",
-                            "metroId",
-                            "year",
-                        ]
-                    ]
+                    "localId": localId,
+                    "gender": genderChartData(gender_cnt[localId])
+                    if localId in gender_cnt
+                    else None,
+                    "age": ageChartData(age_cnt[localId], bins)
+                    if localId in age_cnt
+                    else None,
+                    "party": partyChartData(party_count[localId])
+                    if localId in party_count
+                    else None,
                 }
-            )
+                for localId in sorted(districts.registry.local_ids(metroId))
+            ],
+        }
+    )
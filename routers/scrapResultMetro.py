@@ -1,5 +1,5 @@
 from typing import TypeVar
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, Query
 from model.BasicResponse import ErrorResponse, REGION_CODE_ERR, NO_DATA_ERROR_RESPONSE
 from model.MongoDB import client
 from model.ScrapResultCommon import (
@@ -13,23 +13,30 @@ from model.ScrapResultMetro import (
     GenderTemplateDataMetro,
     AgeTemplateDataMetro,
     PartyTemplateDataMetro,
+    TemplateDataBatchMetro,
+)
+from utils import districts, diversity, extremes, histogram, parties
+from utils.response import ModelJSONRoute
+from utils.queries import (
+    age_index_history,
+    gather,
+    gender_means,
+    party_history,
+    region_history,
 )
-from utils import diversity
-
 
-router = APIRouter(prefix="/metroCouncil", tags=["metroCouncil"])
 
-AGE_STAIR = 10
+router = APIRouter(
+    prefix="/metroCouncil", tags=["metroCouncil"], route_class=ModelJSONRoute
+)
 
 
-@router.get("/template-data/{metroId}")
-async def getMetroTemplateData(
-    metroId: int, factor: FactorType, year: int = 2022
-) -> ErrorResponse | GenderTemplateDataMetro | AgeTemplateDataMetro | PartyTemplateDataMetro:
-    if (
-        await client.district_db["metro_district"].find_one({"metroId": metroId})
-        is None
-    ):
+async def getMetroStat(metroId: int) -> ErrorResponse | dict:
+    """
+    Checks that the metro district exists and returns its diversity_index document,
+    or the error response to return
+    """
+    if not districts.registry.has_metro(metroId):
         return ErrorResponse.model_validate(
             {
                 "error": "RegionCodeError",
@@ -37,96 +44,112 @@ async def getMetroTemplateData(
                 "message": f"No metro district with metroId {metroId}.",
             }
         )
+    # the documents of every metro are shared with the age ranking paragraph
+    metro_stats = await client.stats_cache["diversity_index"].find(
+        {"metroId": {"$in": districts.registry.metro_ids()}}
+    )
+    return next((doc for doc in metro_stats if doc["metroId"] == metroId), None)
 
-    metro_stat = await client.stats_db["diversity_index"].find_one({"metroId": metroId})
 
-    match factor:
-        case FactorType.gender:
-            years = list(
+@router.get("/template-data/{metroId}")
+async def getMetroTemplateData(
+    metroId: int, factor: FactorType, year: int = 2022
+) -> ErrorResponse | GenderTemplateDataMetro | AgeTemplateDataMetro | PartyTemplateDataMetro:
+    metro_stat = await getMetroStat(metroId)
+    if isinstance(metro_stat, ErrorResponse):
+        return metro_stat
+    return await buildMetroTemplateData(metroId, factor, year, metro_stat)
+
+
+@router.get("/template-data/{metroId}/batch")
+async def getMetroTemplateDataBatch(
+    metroId: int,
+    factors: list[FactorType] = Query(None),
+    years: list[int] = Query(None),
+) -> ErrorResponse | TemplateDataBatchMetro:
+    """
+    Returns the template data of several factors and years of a metro district at once.
+    Omitting `factors` or `years` selects every factor or every election year.
+    """
+    metro_stat = await getMetroStat(metroId)
+    if isinstance(metro_stat, ErrorResponse):
+        return metro_stat
+
+    factors = list(dict.fromkeys(factors or FactorType))
+    available_years = dict(
+        zip(
+            factors,
+            await gather(*[metroFactorYears(metroId, factor) for factor in factors]),
+        )
+    )
+    years = sorted(set(years or [y for ys in available_years.values() for y in ys]))
+    # years without data of a factor in this district are answered with NoDataError
+    keys = [
+        (factor, year)
+        for factor in factors
+        for year in years
+        if year in available_years[factor]
+    ]
+    results = await gather(
+        *[
+            buildMetroTemplateData(metroId, factor, year, metro_stat)
+            for factor, year in keys
+        ]
+    )
+    data = dict(zip(keys, results))
+    return TemplateDataBatchMetro.model_validate(
+        {
+            "metroId": metroId,
+            "items": [
                 {
-                    doc["year"]
-                    async for doc in client.stats_db["gender_hist"].find(
-                        {
-                            "councilorType": "metro_councilor",
-                            "level": 1,
-                            "is_elected": True,
-                            "metroId": metroId,
-                        }
-                    )
+                    "factor": factor,
+                    "year": year,
+                    "data": data.get((factor, year), NO_DATA_ERROR_RESPONSE),
                 }
+                for factor in factors
+                for year in years
+            ],
+        }
+    )
+
+
+async def metroFactorYears(metroId: int, factor: FactorType) -> list[int]:
+    """
+    Returns the years buildMetroTemplateData finds data of `factor` for, read with
+    the same (cached) queries
+    """
+    if factor == FactorType.age:
+        years, _, _ = await age_index_history(
+            "metro_councilor", level=1, metroId=metroId
+        )
+    elif factor == FactorType.party:
+        years, _, _ = await party_history("metro_councilor", 1, metroId=metroId)
+    else:
+        years, _, _ = await region_history(
+            "gender_hist", "metro_councilor", 1, metroId=metroId
+        )
+    return years
+
+
+async def buildMetroTemplateData(
+    metroId: int, factor: FactorType, year: int, metro_stat: dict
+) -> ErrorResponse | GenderTemplateDataMetro | AgeTemplateDataMetro | PartyTemplateDataMetro:
+    match factor:
+        case FactorType.gender:
+            (years, elected, candidate), means = await gather(
+                region_history("gender_hist", "metro_councilor", 1, metroId=metroId),
+                gender_means("metro_councilor", 1),
             )
-            years.sort()
             assert len(years) >= 2
             year_index = years.index(year)
-            if year_index == 0:
+            if year_index == 0 or year not in candidate:
                 return NO_DATA_ERROR_RESPONSE
 
-            current = await client.stats_db["gender_hist"].find_one(
-                {
-                    "councilorType": "metro_councilor",
-                    "level": 1,
-                    "is_elected": True,
-                    "metroId": metroId,
-                    "year": years[year_index],
-                }
-            )
-
-            current_candidate = await client.stats_db["gender_hist"].find_one(
-                {
-                    "councilorType": "metro_councilor",
-                    "level": 1,
-                    "is_elected": False,
-                    "metroId": metroId,
-                    "year": years[year_index],
-                }
-            )
-
-            previous = await client.stats_db["gender_hist"].find_one(
-                {
-                    "councilorType": "metro_councilor",
-                    "level": 1,
-                    "is_elected": True,
-                    "metroId": metroId,
-                    "year": years[year_index - 1],
-                }
-            )
-
-            previous_candidate = await client.stats_db["gender_hist"].find_one(
-                {
-                    "councilorType": "metro_councilor",
-                    "level": 1,
-                    "is_elected": False,
-                    "metroId": metroId,
-                    "year": years[year_index],
-                }
-            )
-
-            current_all = (
-                await client.stats_db["gender_hist"]
-                .aggregate(
-                    [
-                        {
-                            "$match": {
-                                "councilorType": "metro_councilor",
-                                "level": 1,
-                                "is_elected": True,
-                                "year": years[year_index],
-                            }
-                        },
-                        {
-                            "$group": {
-                                "_id": None,
-                                "male_tot": {"$sum": "$남"},
-                                "female_tot": {"$sum": "$여"},
-                                "district_cnt": {"$sum": 1},
-                            }
-                        },
-                    ]
-                )
-                .to_list(500)
-            )
-            assert len(current_all) == 1
-            current_all = current_all[0]
+            current = elected[years[year_index]][0]
+            current_candidate = candidate[years[year_index]][0]
+            previous = elected[years[year_index - 1]][0]
+            previous_candidate = candidate[years[year_index]][0]
+            current_all = means[years[year_index]]
 
             return GenderTemplateDataMetro.model_validate(
                 {
@@ -165,120 +188,48 @@ async def getMetroTemplateData(
             # ============================
             age_diversity_index = metro_stat["ageDiversityIndex"]
 
-            all_metroIds = [
-                doc["metroId"]
-                async for doc in client.district_db["metro_district"].find()
-            ]
-            all_indices = (
-                await client.stats_db["diversity_index"]
-                .find({"metroId": {"$in": all_metroIds}})
-                .to_list(500)
-            )
-            all_indices.sort(key=lambda x: x["ageDiversityRank"])
-
-            # ============================
-            #    indexHistoryParagraph
-            # ============================
-            years = list(
-                {
-                    doc["year"]
-                    async for doc in client.stats_db["age_hist"].find(
-                        {"councilorType": "metro_councilor"}
-                    )
-                }
-            )
-            years.sort()
-            year_index = years.index(year)
-            if year_index == 0:
-                return NO_DATA_ERROR_RESPONSE
-
-            history_candidate = [
-                await client.stats_db["age_hist"].find_one(
-                    {
-                        "year": year,
-                        "level": 1,
-                        "councilorType": "metro_councilor",
-                        "is_elected": False,
-                        "method": "equal",
-                        "metroId": metroId,
-                    }
-                )
-                for year in years
-            ]
-            history_elected = [
-                await client.stats_db["age_hist"].find_one(
-                    {
-                        "year": year,
-                        "level": 1,
-                        "councilorType": "metro_councilor",
-                        "is_elected": True,
-                        "method": "equal",
-                        "metroId": metroId,
-                    }
+            async def all_metro_indices():
+                return sorted(
+                    await client.stats_cache["diversity_index"].find(
+                        {"metroId": {"$in": districts.registry.metro_ids()}}
+                    ),
+                    key=lambda x: x["ageDiversityRank"],
                 )
-                for year in years
-            ]
 
             # ============================
             #    ageHistogramParagraph
             # ============================
-            age_stat_elected = (
-                await client.stats_db["age_stat"]
-                .aggregate(
-                    [
-                        {
-                            "$match": {
-                                "level": 1,
-                                "councilorType": "metro_councilor",
-                                "is_elected": True,
-                                "metroId": metroId,
-                                "year": years[year_index],
-                            }
-                        },
-                    ]
-                )
-                .to_list(500)
-            )[0]
             most_recent_year = year
-            age_stat_candidate = await client.stats_db["age_stat"].find_one(
-                {
-                    "level": 1,
-                    "councilorType": "metro_councilor",
-                    "is_elected": False,
-                    "metroId": metroId,
-                    "year": most_recent_year,
-                }
-            )
 
-            divArea_id = (
-                await client.stats_db["diversity_index"].find_one(
-                    {"metroId": {"$exists": True}, "ageDiversityRank": 1}
-                )
-            )["metroId"]
-            divArea = await client.stats_db["age_stat"].find_one(
-                {
-                    "level": 1,
-                    "councilorType": "metro_councilor",
-                    "is_elected": True,
-                    "metroId": divArea_id,
-                    "year": most_recent_year,
-                }
+            # the queries of all three paragraphs are independent of each other
+            (
+                all_indices,
+                (years, history_candidate, history_elected),
+                (_, stat_elected, stat_candidate),
+                area_extremes,
+            ) = await gather(
+                all_metro_indices(),
+                age_index_history("metro_councilor", level=1, metroId=metroId),
+                region_history("age_stat", "metro_councilor", 1, metroId=metroId),
+                extremes.get("metro_councilor", most_recent_year),
             )
 
-            uniArea_id = (
-                await client.stats_db["diversity_index"].find_one(
-                    {"metroId": {"$exists": True}, "ageDiversityRank": 16}
-                )
-            )["metroId"]
-            uniArea = await client.stats_db["age_stat"].find_one(
-                {
-                    "level": 1,
-                    "councilorType": "metro_councilor",
-                    "is_elected": True,
-                    "metroId": uniArea_id,
-                    "year": most_recent_year,
-                }
-            )
+            year_index = years.index(year)
+            if year_index == 0:
+                return NO_DATA_ERROR_RESPONSE
+
+            # a year or history entry missing one of its documents has no template
+            if (
+                area_extremes is None
+                or year not in stat_elected
+                or most_recent_year not in stat_candidate
+                or None in history_candidate
+                or None in history_elected
+            ):
+                return NO_DATA_ERROR_RESPONSE
+            age_stat_elected = stat_elected[year][0]
+            age_stat_candidate = stat_candidate[most_recent_year][0]
+            divArea, uniArea = area_extremes["divArea"], area_extremes["uniArea"]
 
             return AgeTemplateDataMetro.model_validate(
                 {
@@ -327,12 +278,12 @@ async def getMetroTemplateData(
                         "firstQuintile": age_stat_elected["data"][0]["firstquintile"],
                         "lastQuintile": age_stat_elected["data"][0]["lastquintile"],
                         "divArea": {
-                            "metroId": divArea_id,
+                            "metroId": divArea["id"],
                             "firstQuintile": divArea["data"][0]["firstquintile"],
                             "lastQuintile": divArea["data"][0]["lastquintile"],
                         },
                         "uniArea": {
-                            "metroId": uniArea_id,
+                            "metroId": uniArea["id"],
                             "firstQuintile": uniArea["data"][0]["firstquintile"],
                             "lastQuintile": uniArea["data"][0]["lastquintile"],
                         },
@@ -342,96 +293,37 @@ async def getMetroTemplateData(
 
         case FactorType.party:
             party_diversity_index = metro_stat["partyDiversityIndex"]
-            years = list(
-                {
-                    doc["year"]
-                    async for doc in client.stats_db["party_hist"].find(
-                        {
-                            "councilorType": "metro_councilor",
-                            "level": 1,
-                            "is_elected": True,
-                            "metroId": metroId,
-                        }
-                    )
-                }
+            years, elected, candidate = await party_history(
+                "metro_councilor", 1, metroId=metroId
             )
-            years.sort()
             assert len(years) >= 2
 
             year_index = years.index(year)
             if year_index == 0:
                 return NO_DATA_ERROR_RESPONSE
 
-            current_elected = client.stats_db["party_hist"].find(
-                {
-                    "councilorType": "metro_councilor",
-                    "level": 1,
-                    "is_elected": True,
-                    "metroId": metroId,
-                    "year": years[year_index],
-                },
-                {
-                    "_id": 0,
-                    "councilorType": 0,
-                    "level": 0,
-                    "is_elected": 0,
-                    "metroId": 0,
-                    "year": 0,
-                },
-            )
-            current_candidate = client.stats_db["party_hist"].find(
-                {
-                    "councilorType": "metro_councilor",
-                    "level": 1,
-                    "is_elected": False,
-                    "metroId": metroId,
-                    "year": years[year_index],
-                },
-                {
-                    "_id": 0,
-                    "councilorType": 0,
-                    "level": 0,
-                    "is_elected": 0,
-                    "metroId": 0,
-                    "year": 0,
-                },
-            )
-            previous = client.stats_db["party_hist"].find(
-                {
-                    "councilorType": "metro_councilor",
-                    "level": 1,
-                    "is_elected": True,
-                    "metroId": metroId,
-                    "year": years[year_index - 1],
-                },
-                {
-                    "_id": 0,
-                    "councilorType": 0,
-                    "level": 0,
-                    "is_elected": 0,
-                    "metroId": 0,
-                    "year": 0,
-                },
-            )
+            current_elected = elected[years[year_index]]
+            current_candidate = candidate.get(years[year_index], [])
+            previous = elected[years[year_index - 1]]
 
             return PartyTemplateDataMetro.model_validate(
                 {
                     "metroId": metroId,
                     "partyDiversityIndex": party_diversity_index,
                     "prevElected": [
-                        {"party": party, "count": doc[party]}
-                        async for doc in previous
-                        for party in doc
+                        count
+                        for doc in previous
+                        for count in diversity.party_counts(doc)
                     ],
                     "currentElected": [
-                        {"party": party, "count": doc[party]}
-                        async for doc in current_elected
-                        for party in doc
+                        count
+                        for doc in current_elected
+                        for count in diversity.party_counts(doc)
                     ],
                     "currentCandidate": [
-                        {"party": party, "count": doc[party]}
-                        async for doc in current_candidate
-                        for party in doc
+                        count
+                        for doc in current_candidate
+                        for count in diversity.party_counts(doc)
                     ],
                 }
             )
@@ -447,14 +339,14 @@ T = TypeVar(
 
 @router.get("/chart-data/{metroId}")
 async def getMetroChartData(
-    metroId: int, factor: FactorType, year: int = 2022
+    metroId: int,
+    factor: FactorType,
+    year: int = 2022,
+    bins: dict = Depends(histogram.age_bins),
 ) -> ErrorResponse | ChartData[GenderChartDataPoint] | ChartData[
     AgeChartDataPoint
 ] | ChartData[PartyChartDataPoint]:
-    if (
-        await client.district_db["metro_district"].find_one({"metroId": metroId})
-        is None
-    ):
+    if not districts.registry.has_metro(metroId):
         return ErrorResponse.model_validate(
             {
                 "error": "RegionCodeError",
@@ -466,8 +358,7 @@ async def getMetroChartData(
     match factor:
         case FactorType.gender:
             gender_cnt = (
-                await client.stats_db["gender_hist"]
-                .find(
+                await client.stats_cache["gender_hist"].find(
                     {
                         "councilorType": "metro_councilor",
                         "level": 1,
@@ -476,7 +367,6 @@ async def getMetroChartData(
                         "year": year,
                     }
                 )
-                .to_list(5)
             )[0]
 
             return ChartData[GenderChartDataPoint].model_validate(
@@ -490,8 +380,7 @@ async def getMetroChartData(
 
         case FactorType.age:
             age_cnt = (
-                await client.stats_db["age_hist"]
-                .find(
+                await client.stats_cache["age_hist"].find(
                     {
                         "councilorType": "metro_councilor",
                         "level": 1,
@@ -501,53 +390,24 @@ async def getMetroChartData(
                         "year": year,
                     }
                 )
-                .to_list(5)
             )[0]
-            age_list = [
-                age["minAge"] for age in age_cnt["data"] for _ in range(age["count"])
-            ]
-            age_stair = diversity.count(age_list, stair=AGE_STAIR)
             return ChartData[AgeChartDataPoint].model_validate(
-                {
-                    "data": [
-                        {
-                            "minAge": age,
-                            "maxAge": age + AGE_STAIR,
-                            "count": age_stair[age],
-                        }
-                        for age in age_stair
-                    ]
-                }
+                {"data": histogram.rebin(age_cnt["data"], **bins)}
             )
 
         case FactorType.party:
             party_count = (
-                await client.stats_db["party_hist"]
-                .find(
+                await client.stats_cache["party_hist"].find(
                     {
                         "councilorType": "metro_councilor",
                         "level": 1,
                         "is_elected": True,
                         "metroId": metroId,
                         "year": year,
-                    }
+                    },
+                    parties.layout.projection(),
                 )
-                .to_list(5)
             )[0]
             return ChartData[PartyChartDataPoint].model_validate(
-                {
-                    "data": [
-                        {"party": party, "count": party_count[party]}
-                        for party in party_count
-                        if party
-                        not in [
-                            "_id",
-                            "councilorType",
-                            "level",
-                            "is_elected",
-                            "metroId",
-                            "year",
-                        ]
-                    ]
-                }
+                {"data": diversity.party_counts(party_count)}
             )
@@ -1,5 +1,5 @@
 from typing import TypeVar
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 from model.BasicResponse import ErrorResponse, NO_DATA_ERROR_RESPONSE
 from model.MongoDB import client
 from model.ScrapResultCommon import (
@@ -14,19 +14,21 @@ from model.ScrapResultNational import (
     AgeTemplateDataNational,
     PartyTemplateDataNational,
 )
-from utils import diversity
+from utils import diversity, histogram, parties
+from utils.response import ModelJSONRoute
+from utils.queries import age_index_history, gather, party_history, region_history
 
 
-router = APIRouter(prefix="/nationalCouncil", tags=["nationalCouncil"])
-
-AGE_STAIR = 10
+router = APIRouter(
+    prefix="/nationalCouncil", tags=["nationalCouncil"], route_class=ModelJSONRoute
+)
 
 
 @router.get("/template-data")
 async def getNationalTemplateData(
     factor: FactorType, year: int = 2020
 ) -> ErrorResponse | GenderTemplateDataNational | AgeTemplateDataNational | PartyTemplateDataNational:
-    national_stat = await client.stats_db["diversity_index"].find_one(
+    national_stat = await client.stats_cache["diversity_index"].find_one(
         {"national": True}
     )
     if national_stat is None:
@@ -34,60 +36,19 @@ async def getNationalTemplateData(
 
     match factor:
         case FactorType.gender:
-            years = list(
-                {
-                    doc["year"]
-                    async for doc in client.stats_db["gender_hist"].find(
-                        {
-                            "councilorType": "national_councilor",
-                            "level": 0,
-                            "is_elected": True,
-                        }
-                    )
-                }
+            years, elected, candidate = await region_history(
+                "gender_hist", "national_councilor", 0
             )
-            years.sort()
             assert len(years) >= 2
 
             year_index = years.index(year)
             if year_index == 0:
                 return NO_DATA_ERROR_RESPONSE
 
-            current = await client.stats_db["gender_hist"].find_one(
-                {
-                    "councilorType": "national_councilor",
-                    "level": 0,
-                    "is_elected": True,
-                    "year": years[year_index],
-                }
-            )
-
-            current_candidate = await client.stats_db["gender_hist"].find_one(
-                {
-                    "councilorType": "national_councilor",
-                    "level": 0,
-                    "is_elected": False,
-                    "year": years[year_index - 1],
-                }
-            )
-
-            previous = await client.stats_db["gender_hist"].find_one(
-                {
-                    "councilorType": "national_councilor",
-                    "level": 0,
-                    "is_elected": True,
-                    "year": years[year_index],
-                }
-            )
-
-            previous_candidate = await client.stats_db["gender_hist"].find_one(
-                {
-                    "councilorType": "national_councilor",
-                    "level": 0,
-                    "is_elected": False,
-                    "year": years[year_index - 1],
-                }
-            )
+            current = elected[years[year_index]][0]
+            current_candidate = candidate[years[year_index - 1]][0]
+            previous = elected[years[year_index]][0]
+            previous_candidate = candidate[years[year_index - 1]][0]
 
             return GenderTemplateDataNational.model_validate(
                 {
@@ -121,70 +82,21 @@ async def getNationalTemplateData(
             # ============================
             age_diversity_index = national_stat["ageDiversityIndex"]
 
-            # ============================
-            #    indexHistoryParagraph
-            # ============================
-            years = list(
-                {
-                    doc["year"]
-                    async for doc in client.stats_db["age_hist"].find(
-                        {"councilorType": "national_councilor"}
-                    )
-                }
-            )
-            years.sort()
-            history_candidate = [
-                await client.stats_db["age_hist"].find_one(
-                    {
-                        "year": year,
-                        "councilorType": "national_councilor",
-                        "is_elected": False,
-                        "method": "equal",
-                    }
-                )
-                for year in years
-            ]
-            history_elected = [
-                await client.stats_db["age_hist"].find_one(
-                    {
-                        "year": year,
-                        "councilorType": "national_councilor",
-                        "is_elected": True,
-                        "method": "equal",
-                    }
-                )
-                for year in years
-            ]
-
             # ============================
             #    ageHistogramParagraph
             # ============================
-            age_stat_elected = (
-                await client.stats_db["age_stat"]
-                .aggregate(
-                    [
-                        {
-                            "$match": {
-                                "level": 0,
-                                "councilorType": "national_councilor",
-                                "is_elected": True,
-                                "year": year,
-                            }
-                        },
-                        {"$sort": {"year": -1}},
-                        {"$limit": 1},
-                    ]
-                )
-                .to_list(500)
-            )[0]
+            # both histograms are matched on `year`, so the histogram query and the
+            # history query are independent of each other
+            (
+                (years, history_candidate, history_elected),
+                (_, stat_elected, stat_candidate),
+            ) = await gather(
+                age_index_history("national_councilor"),
+                region_history("age_stat", "national_councilor", 0),
+            )
+            age_stat_elected = stat_elected.get(year, [])[0]
+            age_stat_candidate = stat_candidate.get(year, [None])[0]
             most_recent_year = age_stat_elected["year"]
-            age_stat_candidate = await client.stats_db["age_stat"].find_one(
-                {
-                    "councilorType": "national_councilor",
-                    "is_elected": False,
-                    "year": most_recent_year,
-                }
-            )
 
             return AgeTemplateDataNational.model_validate(
                 {
@@ -229,87 +141,33 @@ async def getNationalTemplateData(
 
         case FactorType.party:
             party_diversity_index = national_stat["partyDiversityIndex"]
-            years = list(
-                {
-                    doc["year"]
-                    async for doc in client.stats_db["party_hist"].find(
-                        {
-                            "councilorType": "national_councilor",
-                            "level": 0,
-                            "is_elected": True,
-                        }
-                    )
-                }
-            )
-            years.sort()
+            years, elected, candidate = await party_history("national_councilor", 0)
             assert len(years) >= 2
             year_index = years.index(year)
             if year_index == 0:
                 return NO_DATA_ERROR_RESPONSE
-            
-            current_elected = client.stats_db["party_hist"].find(
-                {
-                    "councilorType": "national_councilor",
-                    "level": 0,
-                    "is_elected": True,
-                    "year": years[year_index],
-                },
-                {
-                    "_id": 0,
-                    "councilorType": 0,
-                    "level": 0,
-                    "is_elected": 0,
-                    "year": 0,
-                },
-            )
-            current_candidate = client.stats_db["party_hist"].find(
-                {
-                    "councilorType": "national_councilor",
-                    "level": 0,
-                    "is_elected": False,
-                    "year": years[year_index],
-                },
-                {
-                    "_id": 0,
-                    "councilorType": 0,
-                    "level": 0,
-                    "is_elected": 0,
-                    "year": 0,
-                },
-            )
-            previous = client.stats_db["party_hist"].find(
-                {
-                    "councilorType": "national_councilor",
-                    "level": 0,
-                    "is_elected": True,
-                    "year": years[year_index - 1],
-                },
-                {
-                    "_id": 0,
-                    "councilorType": 0,
-                    "level": 0,
-                    "is_elected": 0,
-                    "year": 0,
-                },
-            )
+
+            current_elected = elected[years[year_index]]
+            current_candidate = candidate.get(years[year_index], [])
+            previous = elected[years[year_index - 1]]
 
             return PartyTemplateDataNational.model_validate(
                 {
                     "partyDiversityIndex": party_diversity_index,
                     "prevElected": [
-                        {"party": party, "count": doc[party]}
-                        async for doc in previous
-                        for party in doc
+                        count
+                        for doc in previous
+                        for count in diversity.party_counts(doc)
                     ],
                     "currentElected": [
-                        {"party": party, "count": doc[party]}
-                        async for doc in current_elected
-                        for party in doc
+                        count
+                        for doc in current_elected
+                        for count in diversity.party_counts(doc)
                     ],
                     "currentCandidate": [
-                        {"party": party, "count": doc[party]}
-                        async for doc in current_candidate
-                        for party in doc
+                        count
+                        for doc in current_candidate
+                        for count in diversity.party_counts(doc)
                     ],
                 }
             )
@@ -317,15 +175,16 @@ async def getNationalTemplateData(
 
 @router.get("/chart-data")
 async def getNationalChartData(
-    factor: FactorType, year: int = 2020
+    factor: FactorType,
+    year: int = 2020,
+    bins: dict = Depends(histogram.age_bins),
 ) -> ErrorResponse | ChartData[GenderChartDataPoint] | ChartData[
     AgeChartDataPoint
 ] | ChartData[PartyChartDataPoint]:
     match factor:
         case FactorType.gender:
             gender_cnt = (
-                await client.stats_db["gender_hist"]
-                .find(
+                await client.stats_cache["gender_hist"].find(
                     {
                         "councilorType": "national_councilor",
                         "level": 0,
@@ -333,7 +192,6 @@ async def getNationalChartData(
                         "is_elected": True,
                     }
                 )
-                .to_list(5)
             )[0]
 
             return ChartData[GenderChartDataPoint].model_validate(
@@ -347,8 +205,7 @@ async def getNationalChartData(
 
         case FactorType.age:
             age_cnt = (
-                await client.stats_db["age_hist"]
-                .find(
+                await client.stats_cache["age_hist"].find(
                     {
                         "councilorType": "national_councilor",
                         "level": 0,
@@ -357,51 +214,23 @@ async def getNationalChartData(
                         "year": year,
                     }
                 )
-                .to_list(5)
             )[0]
-            age_list = [
-                age["minAge"] for age in age_cnt["data"] for _ in range(age["count"])
-            ]
-            age_stair = diversity.count(age_list, stair=AGE_STAIR)
             return ChartData[AgeChartDataPoint].model_validate(
-                {
-                    "data": [
-                        {
-                            "minAge": age,
-                            "maxAge": age + AGE_STAIR,
-                            "count": age_stair[age],
-                        }
-                        for age in age_stair
-                    ]
-                }
+                {"data": histogram.rebin(age_cnt["data"], **bins)}
             )
 
         case FactorType.party:
             party_count = (
-                await client.stats_db["party_hist"]
-                .find(
+                await client.stats_cache["party_hist"].find(
                     {
                         "councilorType": "national_councilor",
                         "level": 0,
                         "is_elected": True,
                         "year": year,
-                    }
+                    },
+                    parties.layout.projection(),
                 )
-                .to_list(5)
             )[0]
             return ChartData[PartyChartDataPoint].model_validate(
-                {
-                    "data": [
-                        {"party": party, "count": party_count[party]}
-                        for party in party_count
-                        if party
-                        not in [
-                            "_id",
-                            "councilorType",
-                            "level",
-                            "is_elected",
-                            "year",
-                        ]
-                    ]
-                }
+                {"data": diversity.party_counts(party_count)}
             )
@@ -0,0 +1,75 @@
+from dotenv import load_dotenv
+import math
+import os
+import shutil
+import tempfile
+import uvicorn
+
+load_dotenv()
+
+# most worker processes started when WEB_CONCURRENCY is not set; each worker holds
+# its own connection pool and caches
+MAX_DEFAULT_WORKERS = 4
+
+
+def available_cpus():
+    """
+    Returns the number of CPUs the process may use: those it is pinned to, further
+    limited by the cgroup CPU quota of its container. os.cpu_count() is the host's.
+    """
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else 1
+    try:
+        # cgroup v2: "<quota> <period>", or "max <period>" without a quota
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+    except (OSError, ValueError):
+        try:
+            # cgroup v1: a quota of -1 without one
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+                quota = f.read().strip()
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+                period = f.read().strip()
+        except OSError:
+            quota, period = "max", "1"
+    if quota not in ("max", "-1"):
+        cpus = min(cpus, math.ceil(int(quota) / int(period)))
+    return max(cpus, 1)
+
+
+# worker processes; uvicorn's own variable, defaulting to one per available CPU up
+# to MAX_DEFAULT_WORKERS
+WEB_CONCURRENCY = int(
+    os.getenv("WEB_CONCURRENCY", str(min(available_cpus(), MAX_DEFAULT_WORKERS)))
+)
+# seconds a worker keeps serving in-flight requests after SIGTERM
+GRACEFUL_SHUTDOWN_TIMEOUT = int(os.getenv("GRACEFUL_SHUTDOWN_TIMEOUT", "20"))
+
+
+def main():
+    """
+    Runs the app in WEB_CONCURRENCY worker processes sharing one listening socket.
+    A worker accepts connections only once its lifespan startup (district registry,
+    dataset version, connection pool warm-up) is done. In snapshot mode the workers
+    share the pages of the memory-mapped snapshot file instead of copying it.
+    """
+    multiproc_dir = None
+    if WEB_CONCURRENCY > 1 and "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        # /metrics aggregates the workers through files in this directory
+        multiproc_dir = tempfile.mkdtemp(prefix="prometheus-")
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = multiproc_dir
+    try:
+        uvicorn.run(
+            "main:app",
+            host="0.0.0.0",
+            port=80,
+            workers=WEB_CONCURRENCY,
+            timeout_graceful_shutdown=GRACEFUL_SHUTDOWN_TIMEOUT,
+            proxy_headers=True,
+        )
+    finally:
+        if multiproc_dir is not None:
+            shutil.rmtree(multiproc_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+from contextlib import asynccontextmanager
+import os
+import pytest
+
+# the routes must query the database, read at import time by the app modules
+os.environ["SNAPSHOT_PATH"] = ""
+os.environ["CACHE_WARMUP"] = "false"
+
+
+@pytest.fixture
+def seeded_app(monkeypatch):
+    """
+    Returns an async context manager that runs the app's lifespan against a fresh
+    in-memory database seeded with the synthetic dataset, and yields the app
+    """
+    from benchmark import seed
+    from main import app
+    from model import MongoDB
+    from mongomock_motor import AsyncMongoMockClient
+
+    # one client for the app and the test, kept open across lifespans
+    client = AsyncMongoMockClient()
+    client.close = lambda: None
+    monkeypatch.setattr(MongoDB, "AsyncIOMotorClient", lambda *args, **kwargs: client)
+    monkeypatch.setattr(MongoDB, "AsyncIOMotorDatabase", lambda c, name: c[name])
+
+    @asynccontextmanager
+    async def running():
+        async with app.router.lifespan_context(app):
+            await seed.seed_app()
+            yield app
+
+    return running
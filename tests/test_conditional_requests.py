@@ -0,0 +1,49 @@
+from datetime import datetime, timezone
+from starlette.datastructures import Headers
+from utils import etag
+import asyncio
+import httpx
+import pytest
+
+LAST_MODIFIED = datetime(2024, 6, 3, 12, 0, 0, tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize(
+    "since, expected",
+    [
+        ("Mon, 03 Jun 2024 12:00:00 GMT", True),
+        ("Mon, 03 Jun 2024 11:59:59 GMT", False),
+        # parsed as naive datetimes, which are in GMT as well
+        ("Mon, 03 Jun 2024 12:00:00 -0000", True),
+        ("Mon, 03 Jun 2024 11:59:59 -0000", False),
+        ("Mon, 03 Jun 2024 21:00:00 +0900", True),
+        ("not a date", False),
+    ],
+)
+def test_not_modified_since(since, expected):
+    headers = Headers({"if-modified-since": since})
+    assert etag.not_modified_since(headers, LAST_MODIFIED) is expected
+
+
+def test_conditional_request_with_a_naive_date(seeded_app):
+    async def scenario():
+        async with seeded_app() as app:
+            transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://test"
+            ) as http:
+                return [
+                    (
+                        await http.get(
+                            "/nationalCouncil/chart-data",
+                            params={"factor": "gender"},
+                            headers={"if-modified-since": since},
+                        )
+                    ).status_code
+                    for since in [
+                        "Sun, 18 Oct 2099 00:00:00 -0000",
+                        "Sat, 01 Jan 2000 00:00:00 -0000",
+                    ]
+                ]
+
+    assert asyncio.run(scenario()) == [304, 200]
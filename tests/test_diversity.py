@@ -0,0 +1,19 @@
+from utils import diversity
+import numpy as np
+
+
+def test_registered_gini_simpson_matches_the_count_formula():
+    rng = np.random.default_rng(0)
+    counts = rng.integers(0, 30, size=(500, 6))
+    counts[:10] = [5, 0, 0, 0, 0, 0]  # a single category
+    counts[10:20] = 0  # no members
+    values = diversity.compute(counts, ["gini_simpson"])["gini_simpson"]
+    assert np.allclose(values[20:], diversity.gini_simpson_counts(counts[20:]))
+    assert (values[:10] == 0).all()
+    assert np.isnan(values[10:20]).all()
+
+
+def test_gini_simpson_counts_of_a_single_category():
+    assert diversity.gini_simpson_counts([5, 0, 0]) == 0.0
+    assert diversity.gini_simpson_counts([1, 0]) == 0.0
+    assert np.isnan(diversity.gini_simpson_counts([1, 0], opts=False))
@@ -0,0 +1,25 @@
+from routers import health
+from utils import looplag, snapshot
+import asyncio
+import json
+import time
+
+
+def test_readiness_reports_a_blocked_event_loop(seeded_app, monkeypatch):
+    monkeypatch.setattr(health, "READY_MAX_LOOP_LAG_MS", 100)
+
+    async def scenario():
+        async with seeded_app() as app:
+            await asyncio.sleep(2 * looplag.LOOP_LAG_INTERVAL)
+            before = looplag.lag.max_ms
+            # a CPU-bound handler holding the loop
+            time.sleep(0.3)
+            await asyncio.sleep(2 * looplag.LOOP_LAG_INTERVAL)
+            status, body = await asyncio.create_task(snapshot.request(app, "/readyz"))
+            return before, status, json.loads(body)
+
+    before, status, body = asyncio.run(scenario())
+    assert before < 100
+    assert status == 503
+    assert body["eventLoopLagMs"] >= 250
+    assert any(reason.startswith("event loop lag") for reason in body["reasons"])
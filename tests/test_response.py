@@ -0,0 +1,60 @@
+from fastapi import APIRouter, FastAPI
+from pydantic import BaseModel
+from utils.response import ModelJSONRoute
+import asyncio
+import httpx
+import json
+import math
+import pytest
+
+EDGE_FLOATS = [0.0, -0.0, 1e-05, 0.1, 1 / 3, 1e16, 1.5e300, 5e-324, -2.5e-8]
+
+
+class Index(BaseModel):
+    value: float
+
+
+def responses(value):
+    """
+    Returns the (status, body) of an endpoint returning Index(value) through
+    FastAPI's default route and through ModelJSONRoute
+    """
+
+    async def endpoint() -> Index:
+        return Index.model_validate({"value": value})
+
+    app = FastAPI()
+    app.add_api_route("/default", endpoint)
+    router = APIRouter(route_class=ModelJSONRoute)
+    router.add_api_route("/model", endpoint)
+    app.include_router(router)
+
+    async def get_both():
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as http:
+            return [
+                (response.status_code, response.content)
+                for response in [await http.get("/default"), await http.get("/model")]
+            ]
+
+    return asyncio.run(get_both())
+
+
+@pytest.mark.parametrize("value", EDGE_FLOATS)
+def test_floats_decode_to_the_same_values(value):
+    (default_status, default_body), (status, body) = responses(value)
+    assert default_status == status == 200
+    decoded = json.loads(body)["value"]
+    assert decoded == json.loads(default_body)["value"] == value
+    assert math.copysign(1, decoded) == math.copysign(1, value)
+
+
+@pytest.mark.parametrize("value", [math.nan, math.inf])
+def test_non_finite_floats_are_null(value):
+    (default_status, _), (status, body) = responses(value)
+    # FastAPI's encoder refuses them, failing the request
+    assert default_status == 500
+    assert status == 200
+    assert json.loads(body) == {"value": None}
@@ -0,0 +1,62 @@
+from model import MongoDB
+from utils import snapshot
+import asyncio
+import json
+import pytest
+
+# batch route of a region and the filter of its documents
+REGIONS = [
+    ("/localCouncil/template-data/1/1/batch", {"metroId": 1, "localId": 1}),
+    ("/metroCouncil/template-data/1/batch", {"metroId": 1, "localId": None}),
+]
+
+
+def batch_without(seeded_app, path, collection, removed):
+    """
+    Deletes the documents of `collection` matching `removed` from the seeded data and
+    returns the {(factor, year): data} of the batch at `path`
+    """
+
+    async def scenario():
+        async with seeded_app() as app:
+            await MongoDB.client.stats_db[collection].delete_many(removed)
+            MongoDB.client.stats_cache.invalidate()
+            # a task of its own, as every request served by the server
+            return await asyncio.create_task(snapshot.request(app, path))
+
+    status, body = asyncio.run(scenario())
+    assert status == 200, body
+    return {
+        (item["factor"], item["year"]): item["data"]
+        for item in json.loads(body)["items"]
+    }
+
+
+@pytest.mark.parametrize("path, region", REGIONS)
+def test_batch_answers_a_year_without_candidate_age_stat_with_no_data(
+    seeded_app, path, region
+):
+    data = batch_without(
+        seeded_app, path, "age_stat", {**region, "is_elected": False, "year": 2018}
+    )
+    assert data[("age", 2018)]["error"] == "NoDataError"
+    assert "error" not in data[("age", 2022)]
+    assert "error" not in data[("gender", 2018)]
+    assert "error" not in data[("party", 2018)]
+
+
+@pytest.mark.parametrize("path, region", REGIONS)
+def test_batch_answers_age_with_no_data_when_its_history_has_a_gap(
+    seeded_app, path, region
+):
+    data = batch_without(
+        seeded_app,
+        path,
+        "age_hist",
+        {**region, "is_elected": False, "method": "equal", "year": 2014},
+    )
+    for (factor, year), item in data.items():
+        if factor == "age":
+            assert item["error"] == "NoDataError"
+        elif year != 2010:  # the first election has no previous one to compare
+            assert "error" not in item
@@ -0,0 +1,194 @@
+from collections import OrderedDict
+import asyncio
+import contextvars
+import json
+import time
+
+# results are read whole, so they are fetched in a single batch (of at most 16 MiB)
+# instead of a first batch of 101 documents followed by getMore round-trips
+BATCH_SIZE = 100_000
+
+# database round-trips of the current request, set by utils.metrics.MetricsMiddleware
+round_trips = contextvars.ContextVar("round_trips", default=None)
+
+
+class RoundTrips:
+    """
+    Number and total duration (seconds) of the database calls made for a request
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+
+class AsyncTTLCache:
+    """
+    Async LRU cache whose entries expire after `ttl` seconds.
+    Concurrent misses on the same key share a single call of the loader.
+    `listener`, if given, is told of every hit, miss and change of size.
+    """
+
+    def __init__(self, maxsize=4096, ttl=600.0, listener=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.listener = listener
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _resized(self):
+        if self.listener is not None:
+            self.listener.resized(len(self._entries))
+
+    async def get(self, key, loader):
+        """
+        Returns the cached value of `key`, awaiting `loader()` to fill it on a miss
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                if self.listener is not None:
+                    self.listener.hit()
+                return value
+            del self._entries[key]
+            self._resized()
+
+        self.misses += 1
+        if self.listener is not None:
+            self.listener.miss()
+        task = self._pending.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key, loader, self._generation))
+            self._pending[key] = task
+        # shield the shared task so that one cancelled caller does not cancel the others
+        return await asyncio.shield(task)
+
+    async def _load(self, key, loader, generation):
+        try:
+            value = await loader()
+            # results loaded across an invalidation may be stale, so they are not stored
+            if generation == self._generation:
+                self._entries[key] = (time.monotonic() + self.ttl, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                self._resized()
+            return value
+        finally:
+            if self._pending.get(key) is asyncio.current_task():
+                del self._pending[key]
+
+    def invalidate(self, predicate=None):
+        """
+        Drops every entry, or only the entries whose key satisfies `predicate`
+        """
+        self._generation += 1
+        self._pending.clear()
+        if predicate is None:
+            self._entries.clear()
+        else:
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+        self._resized()
+
+
+def normalize(query, sort_keys=True):
+    """
+    Returns a canonical string for a Mongo filter, projection or pipeline
+    """
+    return json.dumps(query, sort_keys=sort_keys, ensure_ascii=False, default=str)
+
+
+class CachedCollection:
+    """
+    Read-through view of a Motor collection. Results are shared between callers,
+    so they must be treated as read-only.
+    """
+
+    def __init__(self, collection, cache):
+        self.collection = collection
+        self.cache = cache
+
+    def _key(self, op, *args, sort_keys=True):
+        return (self.collection.name, op, normalize(args, sort_keys=sort_keys))
+
+    def _counted(self, loader):
+        # loads run in a task created by the request that missed, so they are
+        # counted for that request only and not for those sharing the result
+        async def load():
+            started = time.perf_counter()
+            try:
+                return await loader()
+            finally:
+                stats = round_trips.get()
+                if stats is not None:
+                    stats.count += 1
+                    stats.duration += time.perf_counter() - started
+
+        return load
+
+    async def find_one(self, filter, projection=None):
+        return await self.cache.get(
+            self._key("find_one", filter, projection),
+            self._counted(lambda: self.collection.find_one(filter, projection)),
+        )
+
+    async def find(self, filter, projection=None, sort=None, limit=0):
+        async def load():
+            cursor = self.collection.find(
+                filter, projection, sort=sort, limit=limit, batch_size=BATCH_SIZE
+            )
+            return await cursor.to_list(None)
+
+        # sort specifications are order-sensitive, so they are kept as given
+        return await self.cache.get(
+            self._key("find", filter, projection, limit) + (normalize(sort, False),),
+            self._counted(load),
+        )
+
+    async def distinct(self, key, filter=None):
+        return await self.cache.get(
+            self._key("distinct", key, filter),
+            self._counted(lambda: self.collection.distinct(key, filter)),
+        )
+
+    async def aggregate(self, pipeline):
+        return await self.cache.get(
+            self._key("aggregate", pipeline, sort_keys=False),
+            self._counted(
+                lambda: self.collection.aggregate(
+                    pipeline, batchSize=BATCH_SIZE
+                ).to_list(None)
+            ),
+        )
+
+
+class CachedDatabase:
+    """
+    Read-through view of a Motor database, sharing one cache across its collections
+    """
+
+    def __init__(self, database, cache):
+        self.database = database
+        self.cache = cache
+
+    def __getitem__(self, name):
+        return CachedCollection(self.database[name], self.cache)
+
+    def invalidate(self, collection=None):
+        """
+        Drops the cached results of `collection`, or of every collection if omitted
+        """
+        if collection is None:
+            self.cache.invalidate()
+        else:
+            self.cache.invalidate(lambda key: key[0] == collection)
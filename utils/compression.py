@@ -0,0 +1,194 @@
+from collections import OrderedDict
+from starlette.datastructures import Headers
+import gzip
+import os
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+# responses smaller than this are sent uncompressed (bytes)
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+# memory budget of the precompressed responses (bytes)
+COMPRESSION_CACHE_BYTES = int(os.getenv("COMPRESSION_CACHE_BYTES", str(64 << 20)))
+
+# responses with an ETag are compressed once and cached, so they get the best
+# compression; the others are compressed on every request with cheaper settings
+LEVELS = {
+    "br": {True: 9, False: 4},
+    "gzip": {True: 9, False: 6},
+}
+
+
+def compress(body: bytes, encoding: str, cached: bool = False) -> bytes:
+    level = LEVELS[encoding][cached]
+    if encoding == "br":
+        return brotli.compress(body, quality=level)
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+def negotiate(accept_encoding: str) -> str | None:
+    """
+    Returns the content coding to use for an Accept-Encoding header, preferring br
+    """
+    accepted = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding.strip().lower()] = q
+
+    candidates = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best = None
+    for coding in candidates:
+        q = accepted.get(coding, accepted.get("*", 0.0))
+        if q > 0 and (best is None or q > best[1]):
+            best = (coding, q)
+    return best and best[0]
+
+
+def encoded_etag(etag: bytes, encoding: str) -> bytes:
+    """
+    Each representation gets its own strong ETag: "tag" becomes "tag-br"
+    """
+    if not etag.endswith(b'"'):
+        return etag
+    return etag[:-1] + b"-" + encoding.encode() + b'"'
+
+
+def decoded_etag(etag: str) -> str:
+    for encoding in LEVELS:
+        suffix = f'-{encoding}"'
+        if etag.endswith(suffix):
+            return etag[: -len(suffix)] + '"'
+    return etag
+
+
+class PrecompressedCache:
+    """
+    LRU of compressed bodies keyed by (ETag, encoding), bounded by total size
+    """
+
+    def __init__(self, maxbytes):
+        self.maxbytes = maxbytes
+        self.size = 0
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        body = self._entries.get(key)
+        if body is not None:
+            self._entries.move_to_end(key)
+        return body
+
+    def set(self, key, body):
+        if len(body) > self.maxbytes:
+            return
+        if key in self._entries:
+            self.size -= len(self._entries.pop(key))
+        self._entries[key] = body
+        self.size += len(body)
+        while self.size > self.maxbytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses with br or gzip as negotiated by Accept-Encoding.
+    Responses carrying an ETag are pure functions of it, so their compressed
+    bodies are cached and compression CPU is paid once per dataset version.
+    """
+
+    def __init__(self, app, minimum_size=COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.cache = PrecompressedCache(COMPRESSION_CACHE_BYTES)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        encoding = negotiate(headers.get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        # a 304 names the representation the client has cached
+        cached_encoded = False
+        if "if-none-match" in headers:
+            # validators of compressed representations refer to the identity one inside
+            tags = [tag.strip() for tag in headers["if-none-match"].split(",")]
+            cached_encoded = any(decoded_etag(tag) != tag for tag in tags)
+            raw_headers = [
+                (name, value)
+                for name, value in scope["headers"]
+                if name != b"if-none-match"
+            ]
+            raw_headers.append(
+                (
+                    b"if-none-match",
+                    ", ".join(decoded_etag(tag) for tag in tags).encode("latin-1"),
+                )
+            )
+            scope = {**scope, "headers": raw_headers}
+
+        start = None
+        body = bytearray()
+
+        async def send_compressed(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            body.extend(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            await self.send_response(start, bytes(body), encoding, cached_encoded, send)
+
+        await self.app(scope, receive, send_compressed)
+
+    async def send_response(self, start, body, encoding, cached_encoded, send):
+        response_headers = Headers(raw=start["headers"])
+        etag = response_headers.get("etag")
+        if start["status"] == 304 and etag is not None and cached_encoded:
+            headers = [
+                (name, encoded_etag(value, encoding) if name == b"etag" else value)
+                for name, value in start["headers"]
+            ]
+            start = {**start, "headers": headers + [(b"vary", b"Accept-Encoding")]}
+        elif (
+            start["status"] == 200
+            and len(body) >= self.minimum_size
+            and "content-encoding" not in response_headers
+        ):
+            key = (etag, encoding)
+            compressed = self.cache.get(key) if etag is not None else None
+            if compressed is None:
+                compressed = compress(body, encoding, cached=etag is not None)
+                if etag is not None:
+                    self.cache.set(key, compressed)
+            body = compressed
+            headers = [
+                (name, encoded_etag(value, encoding) if name == b"etag" else value)
+                for name, value in start["headers"]
+                if name != b"content-length"
+            ]
+            headers += [
+                (b"content-encoding", encoding.encode()),
+                (b"content-length", str(len(body)).encode()),
+                (b"vary", b"Accept-Encoding"),
+            ]
+            start = {**start, "headers": headers}
+        await send(start)
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,95 @@
+from bson import ObjectId
+from model.MongoDB import client
+from utils import districts, parties
+import asyncio
+import datetime
+import hashlib
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# seconds between checks of the dataset fingerprint
+DATASET_CHECK_INTERVAL = float(os.getenv("DATASET_CHECK_INTERVAL", "60"))
+
+# document bumped by ingest scripts that update documents in place
+META_COLLECTION = "meta"
+META_ID = "dataset"
+
+
+async def fingerprint():
+    """
+    Returns (version, updatedAt) of the data in district_db and stats_db.
+    The version changes when documents are inserted or removed, or when `touch`
+    is called. updatedAt is the later of the last `touch` and the creation time
+    of the newest ObjectId, so every worker derives the same one; None if neither
+    exists.
+    """
+    parts = []
+    times = []
+    for db in (client.district_db, client.stats_db):
+        for name in sorted(await db.list_collection_names()):
+            count = await db[name].estimated_document_count()
+            last = await db[name].find_one({}, {"_id": 1}, sort=[("_id", -1)])
+            parts.append(f"{db.name}.{name}:{count}:{last and last['_id']}")
+            if last is not None and isinstance(last["_id"], ObjectId):
+                times.append(
+                    last["_id"].generation_time.astimezone(datetime.timezone.utc)
+                )
+    meta = await client.stats_db[META_COLLECTION].find_one({"_id": META_ID})
+    touched = meta["updatedAt"] if meta is not None else None
+    parts.append(str(touched))
+    if touched is not None:
+        if touched.tzinfo is None:
+            # pymongo returns naive UTC datetimes
+            touched = touched.replace(tzinfo=datetime.timezone.utc)
+        times.append(touched)
+    version = hashlib.sha256("|".join(parts).encode()).hexdigest()[:16]
+    return version, max(times, default=None)
+
+
+async def touch():
+    """
+    Marks the dataset as changed; run after updating documents in place
+    """
+    await client.stats_db[META_COLLECTION].replace_one(
+        {"_id": META_ID},
+        {"_id": META_ID, "updatedAt": datetime.datetime.now(datetime.timezone.utc)},
+        upsert=True,
+    )
+
+
+class DatasetVersion:
+    """
+    Tracks the version of the data served in live mode. When it changes, the
+    stats cache, the district registry and the party_hist layout are refreshed
+    so that the data and the version stay consistent.
+    """
+
+    def __init__(self):
+        self.value = None
+        self.modified = None  # aware datetime of the last change, if known
+
+    async def refresh(self):
+        version, updatedAt = await fingerprint()
+        if version == self.value:
+            return False
+        await parties.layout.refresh()
+        if self.value is not None:
+            client.stats_cache.invalidate()
+            await districts.registry.refresh()
+        self.value = version
+        self.modified = updatedAt
+        return True
+
+    async def watch(self, interval=DATASET_CHECK_INTERVAL):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if await self.refresh():
+                    logger.info(f"Dataset changed, now at version {self.value}")
+            except Exception as e:
+                logger.warning(f"Could not check the dataset version: {e}")
+
+
+version = DatasetVersion()
@@ -0,0 +1,69 @@
+from model.MongoDB import client
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# seconds between periodic reloads of the registry
+DISTRICT_REFRESH_INTERVAL = float(os.getenv("DISTRICT_REFRESH_INTERVAL", "300"))
+
+
+class DistrictRegistry:
+    """
+    In-memory copy of district_db's metro and local districts and parties, used to
+    validate region IDs without a database round-trip
+    """
+
+    def __init__(self):
+        self.metros = {}  # metroId -> metro_district document
+        self.locals = {}  # (metroId, localId) -> local_district document
+        self.localIds = {}  # metroId -> localIds of the metro, in collection order
+        self.parties = []  # party documents, in collection order
+        self.version = 0  # incremented on every refresh
+        self.loaded = False
+        self._lock = asyncio.Lock()
+
+    async def refresh(self):
+        """
+        Reloads the collections and swaps the indexes in at once
+        """
+        async with self._lock:
+            metros, locals, localIds = {}, {}, {}
+            parties = [doc async for doc in client.district_db["party"].find()]
+            async for doc in client.district_db["metro_district"].find():
+                metros[doc["metroId"]] = doc
+                localIds.setdefault(doc["metroId"], [])
+            async for doc in client.district_db["local_district"].find():
+                locals[(doc["metroId"], doc["localId"])] = doc
+                localIds.setdefault(doc["metroId"], []).append(doc["localId"])
+            self.metros, self.locals, self.localIds = metros, locals, localIds
+            self.parties = parties
+            self.version += 1
+            self.loaded = True
+
+    async def watch(self, interval=DISTRICT_REFRESH_INTERVAL):
+        """
+        Refreshes the registry every `interval` seconds until cancelled
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning(f"Could not refresh the district registry: {e}")
+
+    def has_metro(self, metroId):
+        return metroId in self.metros
+
+    def has_local(self, metroId, localId):
+        return (metroId, localId) in self.locals
+
+    def metro_ids(self):
+        return list(self.metros)
+
+    def local_ids(self, metroId):
+        return self.localIds.get(metroId, [])
+
+
+registry = DistrictRegistry()
@@ -1,5 +1,6 @@
 from collections import Counter
 import math
+import numpy as np
 
 
 def count(data, stair=0):
@@ -45,3 +46,225 @@ def shannon(data, stair=0, opts=True):
         sh_idx /= max_sh_idx
 
     return sh_idx
+
+
+def count_histogram(values, counts, stair=0):
+    """
+    Same as count(), for data given as (value, count) pairs instead of one item per member
+    """
+    counter = Counter()
+    for value, n in zip(values, counts):
+        if n <= 0:
+            continue
+        if stair > 0:
+            if isinstance(value, str):
+                raise TypeError("stair is not defined for string data")
+            value = math.floor(value / stair) * stair
+        counter[value] += n
+    return counter
+
+
+# fields of the *_hist documents that are not party names
+HIST_FIELDS = [
+    "_id",
+    "councilorType",
+    "level",
+    "is_elected",
+    "localId",
+    "metroId",
+    "year",
+]
+
+# projection of a migrated party_hist document: its metadata and `parties` array
+PARTY_PROJECTION = {
+    **{field: 0 if field == "_id" else 1 for field in HIST_FIELDS},
+    "parties": 1,
+}
+# projection while some documents still hold their counts in top-level fields,
+# whose names are not known in advance
+LEGACY_PARTY_PROJECTION = {"_id": 0}
+
+
+def party_counts(doc):
+    """
+    Returns the [{"party", "count"}] of a party_hist document, read from its `parties`
+    array or, for documents not migrated by utils.parties yet, from its top-level fields
+    """
+    if "parties" in doc:
+        return [
+            {"party": item["party"], "count": item["count"]} for item in doc["parties"]
+        ]
+    return [{"party": key, "count": doc[key]} for key in doc if key not in HIST_FIELDS]
+
+
+def factor_counts(factor, doc, stair=10):
+    """
+    Returns the category counts of a gender_hist, age_hist or party_hist document,
+    with ages binned by `stair` years
+    """
+    match factor:
+        case "gender":
+            return {"남": doc.get("남", 0), "여": doc.get("여", 0)}
+        case "age":
+            return count_histogram(
+                [age["minAge"] for age in doc["data"]],
+                [age["count"] for age in doc["data"]],
+                stair=stair,
+            )
+        case "party":
+            return {item["party"]: item["count"] for item in party_counts(doc)}
+    raise ValueError(f"unknown factor {factor}")
+
+
+def count_matrix(counters):
+    """
+    Aligns the counters of several regions into a (regions x categories) count matrix.
+    Returns the matrix and its categories, in order of first appearance.
+    """
+    categories = list(dict.fromkeys(c for counter in counters for c in counter))
+    column = {c: i for i, c in enumerate(categories)}
+    matrix = np.zeros((len(counters), len(categories)), dtype=np.int64)
+    for row, counter in enumerate(counters):
+        for c, n in counter.items():
+            matrix[row, column[c]] = n
+    return matrix, categories
+
+
+def gini_simpson_counts(counts, opts=True):
+    """
+    Gini-Simpson diversity index of a vector of category counts, or of every row of
+    a (regions x categories) count matrix. Normalized (`opts`), a region with at most
+    one category scores 0; otherwise a single member is nan.
+    """
+    counts = np.asarray(counts, dtype=np.float64)
+    total = counts.sum(axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gs_idx = 1 - (counts * (counts - 1)).sum(axis=-1) / (total * (total - 1))
+        if opts:
+            num_cats = np.count_nonzero(counts, axis=-1)
+            max_gs_idx = (num_cats - 1) / num_cats * total / (total - 1)
+            gs_idx = np.where(num_cats <= 1, 0.0, gs_idx / max_gs_idx)
+    return gs_idx if gs_idx.ndim else float(gs_idx)
+
+
+def shannon_counts(counts, opts=True):
+    """
+    Shannon diversity index of a vector of category counts, or of every row of
+    a (regions x categories) count matrix. Undefined indices (a single category
+    when normalized) are nan.
+    """
+    counts = np.asarray(counts, dtype=np.float64)
+    total = counts.sum(axis=-1, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p = counts / total
+        sh_idx = -np.where(counts > 0, p * np.log(p), 0.0).sum(axis=-1)
+        if opts:
+            sh_idx = sh_idx / np.log(np.count_nonzero(counts, axis=-1))
+    return sh_idx if sh_idx.ndim else float(sh_idx)
+
+
+class Histograms:
+    """
+    Per-row statistics of a (regions x categories) count matrix, computed once and
+    shared by every index of the registry
+    """
+
+    def __init__(self, counts):
+        self.counts = np.atleast_2d(np.asarray(counts, dtype=np.float64))
+        self.total = self.counts.sum(axis=-1)
+        self.num_cats = np.count_nonzero(self.counts, axis=-1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.p = self.counts / self.total[:, None]
+            self.log_p = np.where(self.counts > 0, np.log(self.p), 0.0)
+        self.shannon = -(self.p * self.log_p).sum(axis=-1)
+        self.simpson = (self.p**2).sum(axis=-1)
+
+
+# name -> (function of a Histograms and the parameters, parameter defaults)
+INDICES = {}
+
+
+def register(name, **defaults):
+    """
+    Adds a diversity index to the registry. The function receives a Histograms and
+    the parameters named in `defaults`, and returns one value per row.
+    """
+
+    def decorator(fn):
+        INDICES[name] = (fn, defaults)
+        return fn
+
+    return decorator
+
+
+def compute(counts, names=None, **params):
+    """
+    Computes the indices `names` (all registered ones by default) of every row of a
+    count matrix in one sweep. Returns {name: array of one value per row}; rows
+    without any member are nan.
+    """
+    histograms = Histograms(counts)
+    results = {}
+    for name in names or INDICES:
+        fn, defaults = INDICES[name]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            values = fn(
+                histograms,
+                **{key: params.get(key, value) for key, value in defaults.items()},
+            )
+        results[name] = np.where(histograms.total > 0, values, np.nan)
+    return results
+
+
+@register("gini_simpson")
+def _gini_simpson(h):
+    """
+    Normalized Gini-Simpson index, as gini_simpson_counts: the unbiased index
+    N (1 - sum p^2) / (N - 1) over its maximum (k - 1) / k N / (N - 1), where N
+    cancels out; 0 with at most one category
+    """
+    return np.where(
+        h.num_cats <= 1, 0.0, (1 - h.simpson) * h.num_cats / (h.num_cats - 1)
+    )
+
+
+@register("shannon")
+def _shannon(h):
+    return h.shannon / np.log(h.num_cats)
+
+
+@register("hill", q=2.0)
+def _hill(h, q):
+    """
+    Hill number (effective number of categories) of order q
+    """
+    if q == 1:
+        return np.exp(h.shannon)
+    if math.isinf(q):
+        return 1 / h.p.max(axis=-1)
+    powered = np.where(h.counts > 0, h.p**q, 0.0)
+    return powered.sum(axis=-1) ** (1 / (1 - q))
+
+
+@register("berger_parker")
+def _berger_parker(h):
+    """
+    Share of the most common category
+    """
+    return h.p.max(axis=-1)
+
+
+@register("simpson_evenness")
+def _simpson_evenness(h):
+    """
+    Inverse Simpson concentration divided by the number of categories
+    """
+    return 1 / h.simpson / h.num_cats
+
+
+@register("theil")
+def _theil(h):
+    """
+    Theil index of the category shares; 0 when every category is equally common
+    """
+    return np.log(h.num_cats) - h.shannon
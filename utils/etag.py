@@ -0,0 +1,120 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from starlette.datastructures import Headers
+from utils import dataset, snapshot
+import hashlib
+import os
+
+# Cache-Control of the data routes; shared caches may serve a stale response
+# for STALE_WHILE_REVALIDATE seconds while they revalidate it in the background
+CACHE_MAX_AGE = int(os.getenv("CACHE_MAX_AGE", "60"))
+CACHE_STALE_WHILE_REVALIDATE = int(os.getenv("CACHE_STALE_WHILE_REVALIDATE", "600"))
+
+
+def strong_etag(body: bytes) -> str:
+    """
+    Returns a strong entity tag derived from the response body
+    """
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def not_modified(headers: Headers, etag: str) -> bool:
+    """
+    Whether the request's If-None-Match header matches `etag`
+    """
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is None:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+def not_modified_since(headers: Headers, last_modified: datetime) -> bool:
+    """
+    Whether the request's If-Modified-Since header is not older than `last_modified`
+    """
+    try:
+        since = parsedate_to_datetime(headers["if-modified-since"])
+    except (KeyError, TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        # "-0000" and obsolete zone names parse as naive; HTTP dates are in GMT
+        since = since.replace(tzinfo=timezone.utc)
+    return last_modified.replace(microsecond=0) <= since
+
+
+def current_version():
+    """
+    Returns (version, last modified) of the data being served, or (None, None).
+    The last modified time is None when the data does not record one.
+    """
+    if snapshot.store.current is not None:
+        return (
+            snapshot.store.current.version,
+            datetime.fromisoformat(snapshot.store.current.created_at),
+        )
+    return dataset.version.value, dataset.version.modified
+
+
+class ConditionalCacheMiddleware:
+    """
+    Gives the data routes an ETag derived from the dataset version and the request,
+    and answers matching conditional requests with 304 before any router runs
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.cache_control = (
+            f"public, max-age={CACHE_MAX_AGE}, "
+            f"stale-while-revalidate={CACHE_STALE_WHILE_REVALIDATE}"
+        ).encode()
+
+    async def __call__(self, scope, receive, send):
+        version, last_modified = current_version()
+        if (
+            version is None
+            or scope["type"] != "http"
+            or scope["method"] not in ("GET", "HEAD")
+            or not scope["path"].startswith(snapshot.SNAPSHOT_PREFIXES)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        key = snapshot.snapshot_key(
+            scope["path"], scope["query_string"].decode("latin-1")
+        )
+        etag = strong_etag(f"{version}:{key}".encode())
+        headers = Headers(scope=scope)
+        validators = [(b"cache-control", self.cache_control)]
+        if last_modified is not None:
+            validators.append(
+                (b"last-modified", format_datetime(last_modified, usegmt=True).encode())
+            )
+        if not_modified(headers, etag) or (
+            "if-none-match" not in headers
+            and last_modified is not None
+            and not_modified_since(headers, last_modified)
+        ):
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 304,
+                    "headers": [(b"etag", etag.encode()), *validators],
+                }
+            )
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        async def send_with_validators(message):
+            if message["type"] == "http.response.start" and message["status"] in (
+                200,
+                304,
+            ):
+                response_headers = list(message.get("headers", []))
+                # routes that set their own (content-derived) ETag keep it
+                if not any(name.lower() == b"etag" for name, _ in response_headers):
+                    response_headers.append((b"etag", etag.encode()))
+                message = {**message, "headers": response_headers + validators}
+            await send(message)
+
+        await self.app(scope, receive, send_with_validators)
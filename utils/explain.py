@@ -0,0 +1,202 @@
+from contextlib import contextmanager
+from model.MongoDB import client
+from pymongo import monitoring
+from utils import metrics, snapshot
+import asyncio
+import logging
+import os
+import sys
+import threading
+
+logger = logging.getLogger(__name__)
+
+# requests issued per route and factor, in the order of the snapshot enumeration
+SAMPLES = 8
+
+# commands whose query plan explain() reports; getMore and the like have none
+EXPLAINABLE = ("find", "aggregate", "distinct", "count")
+
+
+class CommandRecorder(monitoring.CommandListener):
+    """
+    Records the commands the clients created after its registration send while
+    `record()` is active. Events are delivered on the driver's threads, hence the lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._commands = None
+
+    @contextmanager
+    def record(self):
+        """
+        Yields the list the (database, command) of every command started inside the
+        block are appended to
+        """
+        commands = []
+        with self._lock:
+            self._commands = commands
+        try:
+            yield commands
+        finally:
+            with self._lock:
+                self._commands = None
+
+    def started(self, event):
+        with self._lock:
+            if self._commands is not None:
+                self._commands.append((event.database_name, dict(event.command)))
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+async def route_commands(app, recorder, samples=SAMPLES):
+    """
+    Issues up to `samples` requests of every route and factor of the snapshot
+    enumeration, each alone against an empty cache, and yields their
+    (route, factor, path, query, status, commands)
+    """
+    requests = {}
+    async for path, query in snapshot.snapshot_requests(client):
+        route = metrics.route_template(
+            app.routes, {"type": "http", "method": "GET", "path": path}
+        )
+        key = (route, (query or {}).get("factor"))
+        if len(requests.setdefault(key, [])) < samples:
+            requests[key].append((path, query))
+
+    for (route, factor), sampled in requests.items():
+        for path, query in sampled:
+            client.stats_cache.invalidate()
+            with recorder.record() as commands:
+                # a task of its own, as every request served by the server
+                status, _ = await asyncio.create_task(
+                    snapshot.request(app, path, query)
+                )
+            yield route, factor, path, query, status, commands
+
+
+def query_shape(value):
+    """
+    Returns `value` with every scalar replaced by its type name, so that commands
+    differing only in their values have the same shape
+    """
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return list({repr(query_shape(item)): query_shape(item) for item in value})
+    return type(value).__name__
+
+
+def explainable(command):
+    """
+    Returns a recorded command without its session and topology fields
+    """
+    return {
+        key: value
+        for key, value in command.items()
+        if not key.startswith("$") and key not in ("lsid", "txnNumber")
+    }
+
+
+def _stages(plan):
+    """
+    Yields every stage of a query plan tree
+    """
+    yield plan
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from _stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _stages(child)
+
+
+def _winning_plans(explained):
+    """
+    Yields the winning plans of an explain result, including those of aggregation stages
+    """
+    if "queryPlanner" in explained:
+        yield explained["queryPlanner"]["winningPlan"]
+    for stage in explained.get("stages", []):
+        if "$cursor" in stage:
+            yield from _winning_plans(stage["$cursor"])
+    for shard in explained.get("shards", {}).values():
+        yield from _winning_plans(shard)
+
+
+async def audit(app, recorder):
+    """
+    Explains every query shape the routes send, recorded from sampled requests, and
+    returns the descriptions of those doing a COLLSCAN
+    """
+    shapes = {}
+    async for route, factor, _, _, _, commands in route_commands(app, recorder):
+        for database, command in commands:
+            name = next(iter(command))
+            if name not in EXPLAINABLE:
+                continue
+            command = explainable(command)
+            # the collection stays literal, the rest of the command is reduced
+            shape = (database, name, command[name], repr(query_shape(command)))
+            shapes.setdefault(
+                shape,
+                (
+                    " ".join(filter(None, [route, factor, name, command[name]])),
+                    database,
+                    command,
+                ),
+            )
+    if not shapes:
+        raise RuntimeError("district_db and stats_db must contain data to audit")
+
+    collscans = []
+    for description, database, command in shapes.values():
+        explained = await client.client[database].command(
+            "explain", command, verbosity="queryPlanner"
+        )
+        stages = [
+            stage["stage"]
+            for plan in _winning_plans(explained)
+            for stage in _stages(plan)
+            if "stage" in stage
+        ]
+        indexes = sorted(
+            {
+                stage["indexName"]
+                for plan in _winning_plans(explained)
+                for stage in _stages(plan)
+                if "indexName" in stage
+            }
+        )
+        if "COLLSCAN" in stages:
+            collscans.append(description)
+        logger.info(
+            f"{'COLLSCAN' if 'COLLSCAN' in stages else 'ok':8} {description:72} "
+            f"{' > '.join(stages)} {', '.join(indexes)}"
+        )
+    return collscans
+
+
+async def main():
+    recorder = CommandRecorder()
+    # registered before the lifespan creates the client
+    monitoring.register(recorder)
+    from main import app
+
+    async with app.router.lifespan_context(app):
+        collscans = await audit(app, recorder)
+    if collscans:
+        logger.error(f"{len(collscans)} query shapes are not index-covered")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    # the routes must query the database, without warming the cache first
+    os.environ["SNAPSHOT_PATH"] = ""
+    os.environ["CACHE_WARMUP"] = "false"
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    asyncio.run(main())
@@ -0,0 +1,111 @@
+from model.MongoDB import client
+from utils import dataset
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# materialized most / least age-diverse area of every election, refreshed at ingest
+COLLECTION = "age_diversity_extremes"
+
+# councilorType: (level, id field of the area)
+AREA_TYPES = {
+    "local_councilor": (2, "localId"),
+    "metro_councilor": (1, "metroId"),
+}
+
+
+def _pipeline(councilorType, year=None):
+    """
+    Pairs each elected age_stat document with the age diversity rank of its area
+    and keeps the best and worst ranked area of every year
+    """
+    level, id_field = AREA_TYPES[councilorType]
+    match = {"level": level, "councilorType": councilorType, "is_elected": True}
+    if year is not None:
+        match["year"] = year
+    # metro documents of diversity_index have no localId, local ones have no metroId
+    other_field = "metroId" if id_field == "localId" else "localId"
+    area = {"id": f"${id_field}", "data": "$data"}
+    return [
+        {"$match": match},
+        {
+            "$lookup": {
+                "from": "diversity_index",
+                "localField": id_field,
+                "foreignField": id_field,
+                "as": "diversity",
+            }
+        },
+        {"$unwind": "$diversity"},
+        {"$match": {f"diversity.{other_field}": {"$exists": False}}},
+        {"$sort": {"diversity.ageDiversityRank": 1}},
+        {
+            "$group": {
+                "_id": "$year",
+                "divArea": {"$first": area},
+                "uniArea": {"$last": area},
+            }
+        },
+    ]
+
+
+async def get(councilorType, year):
+    """
+    Returns the most (`divArea`) and least (`uniArea`) age-diverse area with an
+    elected age_stat in `year`, as {"id": ..., "data": ...} each, or None
+    """
+    # the extremes of every year are read at once and shared by all of them
+    every_year = await client.stats_cache[COLLECTION].find(
+        {"councilorType": councilorType}
+    )
+    extremes = next((doc for doc in every_year if doc["year"] == year), None)
+    if extremes is None:
+        # not refreshed since the last ingest; fall back to a single aggregation
+        computed = await client.stats_cache["age_stat"].aggregate(
+            _pipeline(councilorType, year)
+        )
+        if not computed:
+            return None
+        extremes = computed[0]
+    return extremes
+
+
+async def refresh():
+    """
+    Recomputes the extremes of every election; run after new data is ingested
+    """
+    for councilorType, (level, _) in AREA_TYPES.items():
+        computed = (
+            await client.stats_db["age_stat"]
+            .aggregate(_pipeline(councilorType))
+            .to_list(None)
+        )
+        for doc in computed:
+            await client.stats_db[COLLECTION].replace_one(
+                {"councilorType": councilorType, "year": doc["_id"]},
+                {
+                    "councilorType": councilorType,
+                    "level": level,
+                    "year": doc["_id"],
+                    "divArea": doc["divArea"],
+                    "uniArea": doc["uniArea"],
+                },
+                upsert=True,
+            )
+        logger.info(f"Refreshed {len(computed)} years of {councilorType}")
+    client.stats_cache.invalidate(COLLECTION)
+    await dataset.touch()
+
+
+async def main():
+    client.connect()
+    try:
+        await refresh()
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    asyncio.run(main())
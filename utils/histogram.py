@@ -0,0 +1,61 @@
+from fastapi import HTTPException, Query
+import bisect
+import math
+
+# default width of the age chart bins (years)
+AGE_STAIR = 10
+
+
+def check_edges(edges):
+    """
+    Raises ValueError unless `edges` are at least two strictly increasing bin edges
+    """
+    if len(edges) < 2 or any(a >= b for a, b in zip(edges, edges[1:])):
+        raise ValueError("edges must be at least two strictly increasing values")
+
+
+def rebin(data, stair=AGE_STAIR, edges=None):
+    """
+    Merges the bins of an age histogram ([{"minAge", "count", ...}]) into `stair`-year
+    bins, or into the bins [edges[i], edges[i + 1]) when `edges` are given.
+    A source bin is counted in the bin containing its minAge; source bins outside
+    the edges and empty bins are left out. Bins keep their order of first appearance.
+    Returns [{"minAge", "maxAge", "count"}] in O(bins), without expanding the counts.
+    """
+    if edges is not None:
+        check_edges(edges)
+    elif stair <= 0:
+        raise ValueError("stair must be positive")
+
+    merged = {}
+    for point in data:
+        if point["count"] <= 0:
+            continue
+        if edges is None:
+            low = math.floor(point["minAge"] / stair) * stair
+            high = low + stair
+        else:
+            i = bisect.bisect_right(edges, point["minAge"]) - 1
+            if i < 0 or i >= len(edges) - 1:
+                continue
+            low, high = edges[i], edges[i + 1]
+        if low in merged:
+            merged[low]["count"] += point["count"]
+        else:
+            merged[low] = {"minAge": low, "maxAge": high, "count": point["count"]}
+    return list(merged.values())
+
+
+def age_bins(
+    stair: int = Query(AGE_STAIR, gt=0), edges: list[int] = Query(None)
+) -> dict:
+    """
+    Query parameters choosing the bins of an age chart: `stair`-year bins, or the
+    bins between consecutive `edges` when given
+    """
+    if edges is not None:
+        try:
+            check_edges(edges)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+    return {"stair": stair, "edges": edges}
@@ -0,0 +1,37 @@
+import asyncio
+import collections
+import os
+
+# seconds between the ticks sampling the event loop lag
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "0.1"))
+# seconds of samples the reported lag is the maximum of
+LOOP_LAG_WINDOW = float(os.getenv("LOOP_LAG_WINDOW", "10"))
+
+
+class LoopLag:
+    """
+    Event loop lag sampled by a background ticker: how much later than scheduled
+    each tick wakes up. A handler blocking the loop delays the next tick by as long,
+    so the recent maximum shows blocking that a single probe would not see.
+    """
+
+    def __init__(self):
+        self.samples = collections.deque()  # milliseconds, most recent last
+
+    @property
+    def max_ms(self) -> float:
+        """
+        Largest lag of the last LOOP_LAG_WINDOW seconds, 0 before the first tick
+        """
+        return max(self.samples, default=0.0)
+
+    async def watch(self, interval=LOOP_LAG_INTERVAL, window=LOOP_LAG_WINDOW):
+        self.samples = collections.deque(maxlen=max(int(window / interval), 1))
+        loop = asyncio.get_running_loop()
+        while True:
+            scheduled = loop.time() + interval
+            await asyncio.sleep(interval)
+            self.samples.append(max(loop.time() - scheduled, 0.0) * 1000)
+
+
+lag = LoopLag()
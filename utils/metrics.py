@@ -0,0 +1,254 @@
+from fastapi import Request, Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from pymongo import monitoring
+from starlette.datastructures import QueryParams
+from starlette.routing import Match
+from utils.cache import RoundTrips, round_trips
+import os
+import threading
+import time
+
+# values of the `factor` label; anything else is reported as "none"
+FACTORS = ("gender", "age", "party")
+
+# scope key of the requests the server issues to itself, e.g. the cache warmup,
+# which are left out of the request metrics
+INTERNAL_REQUEST = "newways.internal"
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Latency of the HTTP requests",
+    ["route", "method", "factor", "status"],
+)
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes",
+    "Size of the HTTP response bodies as sent, after compression",
+    ["route", "method", "factor"],
+    buckets=[256 << (2 * i) for i in range(8)],
+)
+REQUEST_ROUND_TRIPS = Histogram(
+    "http_request_db_round_trips",
+    "Database round-trips made for one HTTP request",
+    ["route", "method"],
+    buckets=[0, 1, 2, 3, 5, 8, 13, 21, 34],
+)
+MONGO_COMMANDS = Counter(
+    "mongodb_commands_total",
+    "MongoDB commands sent",
+    ["command", "collection", "outcome"],
+)
+MONGO_COMMAND_DURATION = Histogram(
+    "mongodb_command_duration_seconds",
+    "Duration of the MongoDB commands",
+    ["command", "collection"],
+)
+STATS_CACHE_HITS = Counter("stats_cache_hits", "Queries answered by the stats cache")
+STATS_CACHE_MISSES = Counter(
+    "stats_cache_misses", "Queries of the stats cache sent to MongoDB"
+)
+STATS_CACHE_ENTRIES = Gauge(
+    "stats_cache_entries", "Entries of the stats cache", multiprocess_mode="livesum"
+)
+POOL_CONNECTIONS = Gauge(
+    "mongodb_pool_connections",
+    "Open MongoDB connections",
+    ["address"],
+    multiprocess_mode="livesum",
+)
+POOL_CHECKED_OUT = Gauge(
+    "mongodb_pool_checked_out",
+    "MongoDB connections in use",
+    ["address"],
+    multiprocess_mode="livesum",
+)
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """
+    Counts and times the commands of a Motor client per command and collection.
+    Events are delivered on the driver's threads, hence the lock.
+    """
+
+    def __init__(self):
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):  # e.g. ping, or getMore's cursor id
+            collection = event.command.get("collection", "")
+        with self._lock:
+            self._collections[(event.connection_id, event.request_id)] = collection
+
+    def _finished(self, event, outcome):
+        with self._lock:
+            collection = self._collections.pop(
+                (event.connection_id, event.request_id), ""
+            )
+        MONGO_COMMANDS.labels(event.command_name, collection, outcome).inc()
+        MONGO_COMMAND_DURATION.labels(event.command_name, collection).observe(
+            event.duration_micros / 1e6
+        )
+
+    def succeeded(self, event):
+        self._finished(event, "success")
+
+    def failed(self, event):
+        self._finished(event, "failure")
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """
+    Tracks the open and checked out connections of the pool of every server
+    """
+
+    def __init__(self):
+        self.pools = {}  # "host:port" -> {"open": n, "checkedOut": n}
+        self._lock = threading.Lock()
+
+    def _count(self, event, name, gauge, delta):
+        address = "%s:%s" % event.address
+        with self._lock:
+            pool = self.pools.setdefault(address, {"open": 0, "checkedOut": 0})
+            pool[name] += delta
+        gauge.labels(address).inc(delta)
+
+    def connection_created(self, event):
+        self._count(event, "open", POOL_CONNECTIONS, 1)
+
+    def connection_closed(self, event):
+        self._count(event, "open", POOL_CONNECTIONS, -1)
+
+    def connection_checked_out(self, event):
+        self._count(event, "checkedOut", POOL_CHECKED_OUT, 1)
+
+    def connection_checked_in(self, event):
+        self._count(event, "checkedOut", POOL_CHECKED_OUT, -1)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        pass
+
+
+class CacheMetrics:
+    """
+    Exports the counters of the stats cache, which calls it as they change, so
+    that /metrics aggregates them across worker processes like the other metrics
+    """
+
+    def hit(self):
+        STATS_CACHE_HITS.inc()
+
+    def miss(self):
+        STATS_CACHE_MISSES.inc()
+
+    def resized(self, entries):
+        STATS_CACHE_ENTRIES.set(entries)
+
+
+def route_template(routes, scope):
+    """
+    Returns the path template of the route matching a request, like
+    "/localCouncil/chart-data/{metroId}/{localId}", so that labels stay bounded
+    """
+    for route in routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", "")
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """
+    Records the latency and response size of every request by route, method and
+    factor, and reports its database round-trips in a Server-Timing header.
+    Internal requests are passed through untouched.
+    """
+
+    def __init__(self, app, routes):
+        self.app = app
+        self.routes = routes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get(INTERNAL_REQUEST):
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        route = route_template(self.routes, scope)
+        factor = QueryParams(scope["query_string"]).get("factor")
+        if factor not in FACTORS:
+            factor = "none"
+        stats = RoundTrips()
+        token = round_trips.set(stats)
+        status = 500
+        size = 0
+
+        async def send_timed(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                server_timing = (
+                    f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} round-trips", '
+                    f"total;dur={(time.perf_counter() - started) * 1000:.1f}"
+                )
+                message = {
+                    **message,
+                    "headers": list(message["headers"])
+                    + [(b"server-timing", server_timing.encode())],
+                }
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            round_trips.reset(token)
+            method = scope["method"]
+            REQUEST_DURATION.labels(route, method, factor, str(status)).observe(
+                time.perf_counter() - started
+            )
+            RESPONSE_SIZE.labels(route, method, factor).observe(size)
+            REQUEST_ROUND_TRIPS.labels(route, method).observe(stats.count)
+
+
+async def metrics(request: Request) -> Response:
+    """
+    Prometheus exposition of the metrics; with PROMETHEUS_MULTIPROC_DIR set, those
+    of every worker process are aggregated
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(
+        generate_latest(registry), headers={"Content-Type": CONTENT_TYPE_LATEST}
+    )
@@ -0,0 +1,110 @@
+from model.MongoDB import client
+from pymongo import UpdateOne
+from utils import dataset, diversity
+import asyncio
+import logging
+import sys
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = "party_hist"
+
+# documents written per bulk_write
+BATCH_SIZE = 1000
+
+
+async def _rewrite(filter, update):
+    """
+    Applies `update(doc)` to the party_hist documents matching `filter`, skipping
+    those for which it returns None. Returns the number of documents updated.
+    """
+    updated = 0
+    requests = []
+    async for doc in client.stats_db[COLLECTION].find(filter):
+        fields = update(doc)
+        if fields is not None:
+            requests.append(UpdateOne({"_id": doc["_id"]}, fields))
+        if len(requests) >= BATCH_SIZE:
+            await client.stats_db[COLLECTION].bulk_write(requests, ordered=False)
+            updated += len(requests)
+            requests = []
+    if requests:
+        await client.stats_db[COLLECTION].bulk_write(requests, ordered=False)
+        updated += len(requests)
+    return updated
+
+
+async def migrate():
+    """
+    Copies the top-level party counts of every party_hist document without a
+    `parties` array into one. The top-level fields are kept, so servers reading
+    them keep working until `cleanup`.
+    """
+    return await _rewrite(
+        {"parties": {"$exists": False}},
+        lambda doc: {"$set": {"parties": diversity.party_counts(doc)}},
+    )
+
+
+async def cleanup():
+    """
+    Removes the top-level party counts of the migrated party_hist documents;
+    run once every server reads the `parties` array
+    """
+
+    def unset(doc):
+        legacy = [
+            key for key in doc if key not in diversity.HIST_FIELDS and key != "parties"
+        ]
+        return {"$unset": {key: "" for key in legacy}} if legacy else None
+
+    return await _rewrite({"parties": {"$exists": True}}, unset)
+
+
+class Layout:
+    """
+    Whether the party_hist documents have been migrated, i.e. all of them have a
+    `parties` array, checked when the dataset version changes. Until then the
+    routers read whole documents, so the top-level counts of documents not
+    migrated yet are not projected away.
+    """
+
+    def __init__(self):
+        self.migrated = False
+
+    async def refresh(self):
+        collection = client.stats_db[COLLECTION]
+        migrated = await collection.find_one({"parties": {"$exists": True}}, {"_id": 1})
+        legacy = await collection.find_one({"parties": {"$exists": False}}, {"_id": 1})
+        self.migrated = migrated is not None and legacy is None
+
+    def projection(self):
+        """
+        Returns the projection of the party_hist reads
+        """
+        if self.migrated:
+            return diversity.PARTY_PROJECTION
+        return diversity.LEGACY_PARTY_PROJECTION
+
+
+layout = Layout()
+
+
+async def main(step):
+    client.connect()
+    try:
+        updated = await (migrate() if step == "migrate" else cleanup())
+        if updated:
+            # updated in place, which the dataset fingerprint would not notice
+            await dataset.touch()
+        logger.info(f"{step}: {updated} {COLLECTION} documents updated")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2 or sys.argv[1] not in ("migrate", "cleanup"):
+        print("usage: python -m utils.parties <migrate|cleanup>", file=sys.stderr)
+        sys.exit(1)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    asyncio.run(main(sys.argv[1]))
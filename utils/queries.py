@@ -0,0 +1,139 @@
+from fastapi import HTTPException
+from model.MongoDB import client
+from utils import parties
+import asyncio
+import contextvars
+import os
+
+# upper bound on the wall-clock time of the queries issued by one request (seconds)
+QUERY_TIMEOUT = float(os.getenv("QUERY_TIMEOUT", "10"))
+
+_deadline = contextvars.ContextVar("query_deadline", default=None)
+
+
+async def age_index_history(councilorType, level=None, metroId=None, localId=None):
+    """
+    Returns the election years of a region along with its candidate and elected
+    `age_hist` documents for each year, fetched in a single round-trip
+    """
+    query = {"councilorType": councilorType, "method": "equal"}
+    if level is not None:
+        query["level"] = level
+    if metroId is not None:
+        query["metroId"] = metroId
+    if localId is not None:
+        query["localId"] = localId
+
+    docs = await client.stats_cache["age_hist"].find(
+        query,
+        {
+            "_id": 0,
+            "year": 1,
+            "is_elected": 1,
+            "data.count": 1,
+            "diversityIndex": 1,
+            "diversityRank": 1,
+        },
+    )
+    candidate, elected = {}, {}
+    for doc in docs:
+        (elected if doc["is_elected"] else candidate).setdefault(doc["year"], doc)
+
+    years = sorted(candidate.keys() | elected.keys())
+    return (
+        years,
+        [candidate.get(year) for year in years],
+        [elected.get(year) for year in years],
+    )
+
+
+async def region_history(
+    collection, councilorType, level, metroId=None, localId=None, projection=None
+):
+    """
+    Returns the years with elected documents of a region along with its elected and
+    candidate documents of `collection`, as {year: [documents]}, fetched in a single
+    round-trip
+    """
+    query = {"councilorType": councilorType, "level": level}
+    if metroId is not None:
+        query["metroId"] = metroId
+    if localId is not None:
+        query["localId"] = localId
+
+    elected, candidate = {}, {}
+    for doc in await client.stats_cache[collection].find(query, projection):
+        (elected if doc["is_elected"] else candidate).setdefault(
+            doc["year"], []
+        ).append(doc)
+    return sorted(elected), elected, candidate
+
+
+async def party_history(councilorType, level, metroId=None, localId=None):
+    """
+    Returns the region_history of `party_hist`, read with the projection of its
+    current layout
+    """
+    return await region_history(
+        "party_hist",
+        councilorType,
+        level,
+        metroId=metroId,
+        localId=localId,
+        projection=parties.layout.projection(),
+    )
+
+
+async def gender_means(councilorType, level):
+    """
+    Returns the total male and female elected councilors and the number of districts
+    of a council level by year, in a single round-trip shared by all of its regions
+    """
+    totals = await client.stats_cache["gender_hist"].aggregate(
+        [
+            {
+                "$match": {
+                    "councilorType": councilorType,
+                    "level": level,
+                    "is_elected": True,
+                }
+            },
+            {
+                "$group": {
+                    "_id": "$year",
+                    "male_tot": {"$sum": "$남"},
+                    "female_tot": {"$sum": "$여"},
+                    "district_cnt": {"$sum": 1},
+                }
+            },
+        ]
+    )
+    return {doc["_id"]: doc for doc in totals}
+
+
+def _request_deadline():
+    """
+    Returns the loop time by which the current request must finish its queries
+    """
+    deadline = _deadline.get()
+    if deadline is None:
+        deadline = asyncio.get_running_loop().time() + QUERY_TIMEOUT
+        _deadline.set(deadline)
+    return deadline
+
+
+async def gather(*aws):
+    """
+    Runs independent queries concurrently and returns their results in order.
+    If one of them fails or the request runs out of its QUERY_TIMEOUT budget,
+    the others are cancelled.
+    """
+    try:
+        async with asyncio.timeout_at(_request_deadline()):
+            async with asyncio.TaskGroup() as tg:
+                tasks = [tg.create_task(aw) for aw in aws]
+    except TimeoutError:
+        raise HTTPException(status_code=504, detail="Database query timed out.")
+    except ExceptionGroup as e:
+        raise e.exceptions[0]
+    return [task.result() for task in tasks]
@@ -0,0 +1,169 @@
+from model.MongoDB import client
+from pymongo import UpdateOne
+from sortedcontainers import SortedList
+from utils import diversity, extremes
+import asyncio
+import logging
+import math
+import sys
+
+logger = logging.getLogger(__name__)
+
+FACTORS = ["age", "gender", "party"]
+
+# index of the registry stored as {factor}DiversityIndex
+INDEX = "gini_simpson"
+
+
+def _key(value, id):
+    # highest value first; undefined (nan) values rank last
+    return (math.inf if math.isnan(value) else -value, id)
+
+
+class Ranking:
+    """
+    Regions ordered by an index value, highest first. Changing one value moves a
+    single entry of an order-statistics list and reports the regions whose rank changed.
+    """
+
+    def __init__(self, values=None):
+        self.values = dict(values or {})
+        self._order = SortedList(_key(value, id) for id, value in self.values.items())
+
+    def __len__(self):
+        return len(self._order)
+
+    def rank(self, id):
+        return self._order.index(_key(self.values[id], id)) + 1
+
+    def set(self, id, value):
+        """
+        Sets the value of a region and returns {id: new rank} of every region whose
+        rank changed, including the updated one
+        """
+        old = self.values.get(id)
+        if old is not None:
+            old_pos = self._order.index(_key(old, id))
+            self._order.remove(_key(old, id))
+        self.values[id] = value
+        self._order.add(_key(value, id))
+        new_pos = self._order.index(_key(value, id))
+
+        if old is None:
+            # a new region pushes every region after it down by one
+            lo, hi = new_pos, len(self._order) - 1
+        else:
+            lo, hi = sorted((old_pos, new_pos))
+        return {self._order[pos][1]: pos + 1 for pos in range(lo, hi + 1)}
+
+
+class RankingEngine:
+    """
+    Keeps the diversity_index rankings of the local or metro districts in memory and
+    writes back only the documents changed by the recomputation of a region
+    """
+
+    def __init__(self, councilorType):
+        self.councilorType = councilorType
+        self.level, self.id_field = extremes.AREA_TYPES[councilorType]
+        # metro documents of diversity_index have no localId, local ones have no metroId
+        self.other_field = "metroId" if self.id_field == "localId" else "localId"
+        self.rankings = {factor: Ranking() for factor in FACTORS}
+        self.stored = {factor: {} for factor in FACTORS}  # id -> rank in the database
+
+    def _filter(self, id):
+        return {self.id_field: id, self.other_field: {"$exists": False}}
+
+    async def load(self):
+        values = {factor: {} for factor in FACTORS}
+        async for doc in client.stats_db["diversity_index"].find(
+            {self.id_field: {"$exists": True}, self.other_field: {"$exists": False}}
+        ):
+            for factor in FACTORS:
+                if f"{factor}DiversityIndex" in doc:
+                    values[factor][doc[self.id_field]] = doc[f"{factor}DiversityIndex"]
+                    self.stored[factor][doc[self.id_field]] = doc.get(
+                        f"{factor}DiversityRank"
+                    )
+        self.rankings = {factor: Ranking(values[factor]) for factor in FACTORS}
+
+    async def region_values(self, id, year=None):
+        """
+        Computes the index of every factor of a region from its elected histograms
+        of `year`, or of its latest election
+        """
+        query = {
+            "councilorType": self.councilorType,
+            "level": self.level,
+            "is_elected": True,
+            self.id_field: id,
+        }
+        collections = {
+            "gender": ("gender_hist", query),
+            "age": ("age_hist", {**query, "method": "equal"}),
+            "party": ("party_hist", query),
+        }
+        values = {}
+        for factor, (collection, factor_query) in collections.items():
+            if year is not None:
+                factor_query = {**factor_query, "year": year}
+            doc = await client.stats_db[collection].find_one(
+                factor_query, sort=[("year", -1)]
+            )
+            if doc is None:
+                continue
+            matrix, _ = diversity.count_matrix([diversity.factor_counts(factor, doc)])
+            values[factor] = float(diversity.compute(matrix, [INDEX])[INDEX][0])
+        return values
+
+    async def update(self, id, year=None):
+        """
+        Recomputes a region and writes its index values and every changed rank.
+        Returns the number of diversity_index documents written.
+        """
+        changes = {}
+        for factor, value in (await self.region_values(id, year)).items():
+            if self.rankings[factor].values.get(id) != value:
+                changes.setdefault(id, {})[f"{factor}DiversityIndex"] = value
+            for other, rank in self.rankings[factor].set(id, value).items():
+                if self.stored[factor].get(other) != rank:
+                    changes.setdefault(other, {})[f"{factor}DiversityRank"] = rank
+                    self.stored[factor][other] = rank
+        if not changes:
+            return 0
+
+        await client.stats_db["diversity_index"].bulk_write(
+            [
+                UpdateOne(self._filter(other), {"$set": fields}, upsert=other == id)
+                for other, fields in changes.items()
+            ],
+            ordered=False,
+        )
+        return len(changes)
+
+
+async def main(councilorType, ids):
+    client.connect()
+    try:
+        engine = RankingEngine(councilorType)
+        await engine.load()
+        for id in ids:
+            written = await engine.update(id)
+            logger.info(f"Updated {engine.id_field} {id}: {written} documents written")
+        client.stats_cache.invalidate("diversity_index")
+        # the extremes depend on ageDiversityRank; refreshing them also touches the dataset
+        await extremes.refresh()
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    types = {"local": "local_councilor", "metro": "metro_councilor"}
+    if len(sys.argv) < 3 or sys.argv[1] not in types:
+        print(
+            "usage: python -m utils.ranking <local|metro> <localId|metroId> ...",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    asyncio.run(main(types[sys.argv[1]], [int(id) for id in sys.argv[2:]]))
@@ -0,0 +1,45 @@
+from fastapi import Response
+from fastapi.routing import APIRoute
+from pydantic import BaseModel, TypeAdapter
+from typing import Callable, get_args, get_type_hints
+import functools
+
+
+def model_adapters(annotation) -> dict[type, TypeAdapter]:
+    """
+    Returns a TypeAdapter for every pydantic model of a return annotation union
+    """
+    members = get_args(annotation) or (annotation,)
+    return {
+        member: TypeAdapter(member)
+        for member in members
+        if isinstance(member, type) and issubclass(member, BaseModel)
+    }
+
+
+class ModelJSONRoute(APIRoute):
+    """
+    Route whose endpoint returns already validated models: they are serialized
+    straight to JSON bytes by the serializer of their own type, instead of being
+    validated again against the whole return annotation union by FastAPI.
+    The endpoint's signature and annotations, hence the OpenAPI schema, are kept.
+
+    Returned models therefore skip FastAPI's response_model check, and must be
+    built with model_validate. Floats are written by pydantic rather than
+    json.dumps: the same values, but not always the same text (1e-05 becomes
+    0.00001, 1e+16 becomes 1e16), and nan or inf become null where FastAPI's
+    encoder failed the request.
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        adapters = model_adapters(get_type_hints(endpoint).get("return"))
+
+        @functools.wraps(endpoint)
+        async def serialized(*args, **kwargs):
+            result = await endpoint(*args, **kwargs)
+            adapter = adapters.get(type(result))
+            if adapter is None:
+                return result
+            return Response(adapter.dump_json(result), media_type="application/json")
+
+        super().__init__(path, serialized, **kwargs)
@@ -0,0 +1,388 @@
+from datetime import datetime, timezone
+from model.BasicResponse import NO_DATA_ERROR
+from utils.metrics import INTERNAL_REQUEST
+from urllib.parse import parse_qsl, urlencode
+import asyncio
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+
+# file layout: MAGIC | u64 index length | JSON index | payload blob
+MAGIC = b"NWSNAP01"
+HEADER = struct.Struct("<8sQ")
+
+# every response under these prefixes is materialized into the snapshot
+SNAPSHOT_PREFIXES = (
+    "/localCouncil",
+    "/metroCouncil",
+    "/nationalCouncil",
+    "/age-hist",
+    "/diversity-index",
+)
+
+NOT_FOUND_BODY = b'{"detail":"Not Found"}'
+
+logger = logging.getLogger(__name__)
+
+
+def snapshot_key(path, query_string):
+    """
+    Returns the canonical snapshot key of a request, ignoring query parameter order
+    """
+    query = sorted(parse_qsl(query_string, keep_blank_values=True))
+    return f"{path}?{urlencode(query)}" if query else path
+
+
+class Snapshot:
+    """
+    Read-only view of a snapshot file. Payloads are sliced out of a memory map,
+    so processes serving the same file share its pages.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.stat = os.fstat(f.fileno())
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, index_len = HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not a snapshot file")
+        index = json.loads(self._map[HEADER.size : HEADER.size + index_len])
+        self.version = index["version"]
+        self.created_at = index["createdAt"]
+        self._entries = index["entries"]
+        self._base = HEADER.size + index_len
+
+    def __len__(self):
+        return len(self._entries)
+
+    def keys(self):
+        return self._entries.keys()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        offset, length = entry
+        return self._map[self._base + offset : self._base + offset + length]
+
+    def close(self):
+        self._map.close()
+
+
+def write_snapshot(path, responses):
+    """
+    Atomically writes `responses` ({key: body bytes}) to `path` and returns its version
+    """
+    blob = bytearray()
+    offsets = {}
+    entries = {}
+    digest = hashlib.sha256()
+    for key in sorted(responses):
+        body = responses[key]
+        body_hash = hashlib.sha256(body).digest()
+        # identical payloads (e.g. default and explicit year) are stored once
+        if body_hash not in offsets:
+            offsets[body_hash] = len(blob)
+            blob += body
+        entries[key] = [offsets[body_hash], len(body)]
+        digest.update(key.encode() + b"\0" + body_hash)
+
+    version = digest.hexdigest()[:16]
+    index = json.dumps(
+        {
+            "version": version,
+            "createdAt": datetime.now(timezone.utc).isoformat(),
+            "entries": entries,
+        },
+        separators=(",", ":"),
+        ensure_ascii=False,
+    ).encode()
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(index)))
+        f.write(index)
+        f.write(blob)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return version
+
+
+class SnapshotStore:
+    """
+    Holds the snapshot being served and hot-swaps it when the file is replaced
+    """
+
+    def __init__(self):
+        self.current = None
+
+    def load(self, path):
+        snapshot = Snapshot(path)
+        previous, self.current = self.current, snapshot
+        if previous is not None:
+            previous.close()
+        return snapshot
+
+    def reload(self):
+        """
+        Swaps in the snapshot file if it changed on disk since it was loaded
+        """
+        path = self.current.path
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return False
+        if (stat.st_ino, stat.st_mtime_ns) == (
+            self.current.stat.st_ino,
+            self.current.stat.st_mtime_ns,
+        ):
+            return False
+        self.load(path)
+        return True
+
+    async def watch(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.reload()
+            except (OSError, ValueError) as e:
+                logger.warning(f"Failed to reload snapshot: {e}")
+
+    def close(self):
+        if self.current is not None:
+            self.current.close()
+            self.current = None
+
+
+store = SnapshotStore()
+
+
+class SnapshotMiddleware:
+    """
+    Answers snapshotted routes from the loaded snapshot without touching the database
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        snapshot = store.current
+        if (
+            snapshot is None
+            or scope["type"] != "http"
+            or scope["method"] != "GET"
+            or not scope["path"].startswith(SNAPSHOT_PREFIXES)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        body = snapshot.get(
+            snapshot_key(scope["path"], scope["query_string"].decode("latin-1"))
+        )
+        status = 200
+        if body is None:
+            status, body = 404, NOT_FOUND_BODY
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [
+                    (b"content-length", str(len(body)).encode()),
+                    (b"content-type", b"application/json"),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+
+async def request(app, path, query=None, internal=False):
+    """
+    Issues a GET request against an ASGI app in-process and returns (status, body).
+    `internal` requests are left out of the request metrics.
+    """
+    query_string = urlencode(query or {})
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query_string.encode(),
+        "headers": [(b"host", b"snapshot")],
+        "client": None,
+        "server": ("snapshot", 80),
+        INTERNAL_REQUEST: internal,
+    }
+    response = {"status": None, "body": bytearray()}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            response["body"] += message.get("body", b"")
+
+    await app(scope, receive, send)
+    return response["status"], bytes(response["body"])
+
+
+async def snapshot_requests(client):
+    """
+    Enumerates every (path, query) served by the data routers
+    """
+    metroIds = [
+        doc["metroId"] async for doc in client.district_db["metro_district"].find()
+    ]
+    localIds = [
+        (doc["metroId"], doc["localId"])
+        async for doc in client.district_db["local_district"].find()
+    ]
+    years = {
+        councilorType: sorted(
+            await client.stats_db["gender_hist"].distinct(
+                "year", {"councilorType": councilorType}
+            )
+        )
+        for councilorType in [
+            "national_councilor",
+            "metro_councilor",
+            "local_councilor",
+        ]
+    }
+
+    def factor_queries(years):
+        # requests without `year` are answered with the router's default year
+        for factor in ["gender", "age", "party"]:
+            yield {"factor": factor}
+            for year in years:
+                yield {"factor": factor, "year": year}
+
+    def age_hist_queries(years):
+        for ageHistType in ["elected", "candidate"]:
+            for method in ["equal", "kmeans"]:
+                for year in years:
+                    yield {"ageHistType": ageHistType, "year": year, "method": method}
+
+    yield "/localCouncil/regionInfo", None
+    yield "/localCouncil/partyInfo", None
+
+    # diversity indices are served from the snapshot with their default parameters
+    for level in ["national", "metro", "local"]:
+        for factor in ["gender", "age", "party"]:
+            yield f"/diversity-index/{level}", {"factor": factor}
+
+    for query in factor_queries(years["national_councilor"]):
+        yield "/nationalCouncil/template-data", query
+        yield "/nationalCouncil/chart-data", query
+    for query in age_hist_queries(years["national_councilor"]):
+        yield "/age-hist/", query
+
+    for metroId in metroIds:
+        # batch requests are served from the snapshot with all factors and years only
+        yield f"/metroCouncil/template-data/{metroId}/batch", None
+        yield f"/localCouncil/chart-data/{metroId}", None
+        for year in years["local_councilor"]:
+            yield f"/localCouncil/chart-data/{metroId}", {"year": year}
+        for query in factor_queries(years["metro_councilor"]):
+            yield f"/metroCouncil/template-data/{metroId}", query
+            yield f"/metroCouncil/chart-data/{metroId}", query
+        for query in age_hist_queries(years["metro_councilor"]):
+            yield f"/age-hist/{metroId}", query
+
+    for metroId, localId in localIds:
+        yield f"/localCouncil/template-data/{metroId}/{localId}/batch", None
+        for query in factor_queries(years["local_councilor"]):
+            yield f"/localCouncil/template-data/{metroId}/{localId}", query
+            yield f"/localCouncil/chart-data/{metroId}/{localId}", query
+        for query in age_hist_queries(years["local_councilor"]):
+            yield f"/age-hist/{metroId}/{localId}", query
+
+
+def invalid_reason(body):
+    """
+    Returns why a 200 response must not be snapshotted, or None. An empty list or
+    an error other than NoDataError (the routers' answer for years without data)
+    means the app was not ready, e.g. its district registry was not loaded.
+    """
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return "not JSON"
+    if data == []:
+        return "empty list"
+    if isinstance(data, dict) and "error" in data and data.get("code") != NO_DATA_ERROR:
+        return data["error"]
+    return None
+
+
+async def build(app, client, path, concurrency=16):
+    """
+    Materializes every data response of `app` into a snapshot file at `path`.
+    Raises RuntimeError without writing the file if any response is invalid.
+    """
+    responses = {}
+    skipped = []
+    invalid = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(route, query):
+        async with semaphore:
+            key = snapshot_key(route, urlencode(query or {}))
+            try:
+                status, body = await request(app, route, query)
+            except Exception as e:
+                skipped.append((key, repr(e)))
+                return
+            if status != 200:
+                skipped.append((key, status))
+            elif (reason := invalid_reason(body)) is not None:
+                invalid.append((key, reason))
+            else:
+                responses[key] = body
+
+    await asyncio.gather(
+        *[fetch(route, query) async for route, query in snapshot_requests(client)]
+    )
+    if invalid:
+        raise RuntimeError(
+            f"{len(invalid)} responses cannot be snapshotted, e.g. "
+            + ", ".join(f"{key}: {reason}" for key, reason in sorted(invalid)[:5])
+        )
+    return write_snapshot(path, responses), len(responses), skipped
+
+
+async def main(path):
+    from main import app
+    from model import MongoDB
+    from utils import districts
+
+    MongoDB.client.connect()
+    try:
+        # the routers validate region IDs against the registry the lifespan loads
+        await districts.registry.refresh()
+        version, count, skipped = await build(app, MongoDB.client, path)
+    finally:
+        MongoDB.client.close()
+    for key, reason in skipped:
+        logger.warning(f"skipped {key}: {reason}")
+    logger.info(f"Wrote snapshot {version} with {count} responses to {path}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("usage: python -m utils.snapshot <snapshot path>", file=sys.stderr)
+        sys.exit(1)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    asyncio.run(main(sys.argv[1]))
@@ -0,0 +1,96 @@
+from model.MongoDB import client
+from utils import districts, snapshot
+import asyncio
+import logging
+import os
+import time
+
+# warm the stats cache at startup before reporting ready
+CACHE_WARMUP = os.getenv("CACHE_WARMUP", "false").lower() == "true"
+# warmup requests in flight at once
+CACHE_WARMUP_CONCURRENCY = int(os.getenv("CACHE_WARMUP_CONCURRENCY", "8"))
+
+FACTORS = ["gender", "age", "party"]
+
+# a child of uvicorn's logger, so that progress shows in the server log
+logger = logging.getLogger("uvicorn.error").getChild(__name__)
+
+
+def warmup_requests():
+    """
+    Enumerates the template and chart data requests of every region and factor,
+    for the default (current) election year of each route
+    """
+    for factor in FACTORS:
+        query = {"factor": factor}
+        yield "/nationalCouncil/template-data", query
+        yield "/nationalCouncil/chart-data", query
+        for metroId in districts.registry.metro_ids():
+            yield f"/metroCouncil/template-data/{metroId}", query
+            yield f"/metroCouncil/chart-data/{metroId}", query
+            for localId in districts.registry.local_ids(metroId):
+                yield f"/localCouncil/template-data/{metroId}/{localId}", query
+                yield f"/localCouncil/chart-data/{metroId}/{localId}", query
+
+
+class Warmup:
+    """
+    Progress of the startup warmup, which fills the stats cache by requesting the
+    hot set in-process so that the first visitors do not pay for cold queries
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.total = 0
+        self.completed = 0
+        self.failed = 0
+        self.duration = None  # seconds, once finished
+
+    @property
+    def ready(self):
+        return not self.enabled or self.duration is not None
+
+    def start(self, app):
+        """
+        Starts the warmup in the background; the app is not ready until it finishes
+        """
+        self.enabled = True
+        return asyncio.create_task(self.run(app))
+
+    async def run(self, app, concurrency=CACHE_WARMUP_CONCURRENCY):
+        requests = list(warmup_requests())
+        self.total = len(requests)
+        started = time.perf_counter()
+        semaphore = asyncio.Semaphore(concurrency)
+        step = max(self.total // 10, 1)
+
+        async def fetch(path, query):
+            async with semaphore:
+                try:
+                    # kept out of the request metrics, which are the visitors'
+                    status, _ = await snapshot.request(app, path, query, internal=True)
+                except Exception as e:
+                    logger.warning(f"Warmup request {path} {query} failed: {e!r}")
+                    status = None
+                if status != 200:
+                    self.failed += 1
+                self.completed += 1
+                if self.completed % step == 0:
+                    logger.info(f"Cache warmup: {self.completed}/{self.total}")
+
+        # gather runs every request in its own task, hence its own request context
+        await asyncio.gather(*[fetch(path, query) for path, query in requests])
+        self.duration = time.perf_counter() - started
+        logger.info(
+            f"Cache warmup: {self.total} requests in {self.duration:.1f}s, "
+            f"{self.failed} failed"
+        )
+        cache = client.stats_cache.cache
+        if len(cache) >= cache.maxsize:
+            logger.warning(
+                "Cache warmup filled the stats cache; raise STATS_CACHE_MAXSIZE "
+                "to keep the whole warm set"
+            )
+
+
+job = Warmup()